@@ -1,199 +1,139 @@
-if False:
-    import os
-    import imaplib
-    import email
-    from dotenv import load_dotenv
-
-    from flask import Flask, request, render_template
-    from flask_login import LoginManager
-    from flask_migrate import Migrate
-    from models import db, Cliente, ClienteFinal, Cuenta, AdminUser
-    from panelAdmin import panel_bp
-    from extensions import db
-
-    # --------------------------
-    # ✅ Cargar .env
-    # --------------------------
+import os
+import logging
+
+import click
+from dotenv import load_dotenv
+from flask import Flask
+from flask.cli import with_appcontext
+from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from models import db, AdminUser, Estadisticas
+from panelAdmin import panel_bp
+from medidor_sql import MedidorSql
+from perfil_bd import configurar_bd
+import estadisticas
+import reportes
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# --------------------------
+# 📌 Login
+# --------------------------
+login_manager = LoginManager()
+login_manager.login_view = 'panel.login'
+
+@login_manager.user_loader
+def load_user(user_id):
+    return AdminUser.query.get(int(user_id))
+
+
+# --------------------------
+# 🏭 Fábrica de la app: BD, login, panel y comandos
+# --------------------------
+# main.py (web pública + panel), admin.py (solo panel) y los scripts de
+# administración parten de aquí; cada uno agrega lo suyo encima.
+def create_app(config=None):
     load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_NIVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
-    IMAP_USER = os.getenv("IMAP_USER")
-    IMAP_PASS = os.getenv("IMAP_PASS")
-    IMAP_SERVER = os.getenv("IMAP_SERVER")
-    IMAP_PORT_RAW = os.getenv("IMAP_PORT")
-    IMAP_PORT = int(IMAP_PORT_RAW) if IMAP_PORT_RAW else None
-
-    DATABASE_URL = os.getenv("DATABASE_URL")
-
-    if DATABASE_URL and DATABASE_URL.startswith("postgresql://") and "+pg8000" not in DATABASE_URL:
-        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+pg8000://", 1)
-
-    print("✅ DATABASE_URL final:", DATABASE_URL)
-
-    SECRET_KEY = os.getenv("SECRET_KEY", "SUPER_SECRET")
-
-    if not all([IMAP_USER, IMAP_PASS, IMAP_SERVER, IMAP_PORT, DATABASE_URL]):
-        raise Exception("❌ ERROR: Verifica tu archivo .env (IMAP y DATABASE_URL)")
-
-    # --------------------------
-    # ✅ Inicializar Flask
-    # --------------------------
     app = Flask(__name__)
-    app.secret_key = SECRET_KEY
-
-    # --------------------------
-    # ✅ Motor SQLAlchemy
-    # --------------------------
-    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+    app.secret_key = os.getenv("SECRET_KEY", 'TU_SECRET_KEY_PRO')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    db.init_app(app)
+    app.config.update(config or {})
 
-    # --------------------------
-    # ✅ Migraciones: Flask-Migrate
-    # --------------------------
-    migrate = Migrate(app, db)
+    # Detrás del proxy de Render/Heroku request.remote_addr sería siempre el
+    # proxy: con PROXIES_CONFIABLES=1 (lo pone el Procfile) se toma la IP de
+    # X-Forwarded-For. Sin proxy delante debe quedar en 0: cualquiera podría
+    # mandar su propio X-Forwarded-For y saltarse los límites por IP.
+    proxies = int(app.config.get("PROXIES_CONFIABLES", os.getenv("PROXIES_CONFIABLES", 0)))
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
 
     # --------------------------
-    # ✅ Login Manager
+    # 📌 DB config
     # --------------------------
-    login_manager = LoginManager()
+    # La URL efectiva (sin contraseña) la deja perfil_bd en el log
+    database_url = app.config.get('SQLALCHEMY_DATABASE_URI') or os.getenv("DATABASE_URL")
+    if not database_url:
+        os.makedirs(os.path.join(BASE_DIR, 'instance'), exist_ok=True)
+        database_url = f"sqlite:///{os.path.join(BASE_DIR, 'instance', 'mi_base.db')}"
+
+    # Pool/timeouts en Postgres y WAL en SQLite según DB_* / SQLITE_* (ver perfil_bd)
+    configurar_bd(app, db, database_url)
     login_manager.init_app(app)
-    login_manager.login_view = 'panel.login'
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return AdminUser.query.get(int(user_id))
+    # Flask-Migrate arrastra alembic (~0.3 s de arranque) y solo lo usa
+    # `flask db ...`: se registra cuando la app la carga el CLI de flask.
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    # Consultas SQL por request en cabeceras X-SQL-*; SQL_PRESUPUESTO_ESTRICTO=1
+    # (tests) convierte en error pasarse de SQL_PRESUPUESTO o del @presupuesto_sql de la vista.
+    # Se pueden pasar también en config (así lo hace tests/conftest.py).
+    if _ajuste(app, "SQL_MEDIR", "0") == "1":
+        MedidorSql(
+            app,
+            presupuesto=int(_ajuste(app, "SQL_PRESUPUESTO", 0)),
+            estricto=_ajuste(app, "SQL_PRESUPUESTO_ESTRICTO", "0") == "1",
+            umbral_repetidas=int(_ajuste(app, "SQL_UMBRAL_REPETIDAS", 3)),
+        )
+
+    # --------------------------
+    # 📊 Estadísticas del dashboard
+    # --------------------------
+    # Con ESTADISTICAS_PROGRAMADAS=1 (en un solo proceso) se recuentan las vencidas
+    # cada noche; si no corre, el dashboard las recuenta en la primera visita del día.
+    if os.getenv("ESTADISTICAS_PROGRAMADAS", "0") == "1":
+        estadisticas.programar_recalculo(
+            app,
+            hora=int(os.getenv("ESTADISTICAS_HORA", 0)),
+            minuto=int(os.getenv("ESTADISTICAS_MINUTO", 5)),
+        )
 
-    # --------------------------
-    # ✅ Registrar Blueprint
-    # --------------------------
     app.register_blueprint(panel_bp)
-
-    # --------------------------
-    # 🏠 Ruta principal
-    # --------------------------
-    @app.route('/')
-    def index():
-        return render_template('index.html')
-
-    # --------------------------
-    # 🔍 Búsqueda IMAP + FILTROS
-    # --------------------------
-    @app.route('/buscar', methods=['POST'])
-    def buscar():
-        correo_input = request.values.get('correo', '').strip().lower()
-        pin_input = request.values.get('pin', '').strip()
-
-        cuenta = Cuenta.query.filter(
-            db.func.lower(Cuenta.correo) == correo_input
-        ).first()
-
-        filtros = []
-
-        if cuenta:
-            if cuenta.cliente:
-                # Es mayorista/premium
-                if cuenta.filtro_dispositivo:
-                    if not pin_input or pin_input != str(cuenta.cliente.pin_restablecer):
-                        return "❌ PIN inválido o sin permiso."
-                    else:    
-                        filtros.append("Un nuevo dispositivo está usando tu cuenta")
-
-                if cuenta.filtro_netflix:
-                    filtros.append("Netflix: Tu código de inicio de sesión")
-                if cuenta.filtro_actualizar_hogar:
-                    filtros.append("Confirmación: Se ha confirmado tu Hogar con Netflix")
-                if cuenta.filtro_codigo_temporal:
-                    filtros.append("Tu código de acceso temporal de Netflix")
-
-            elif cuenta.cliente_final:
-                # Es cliente final
-                if cuenta.filtro_dispositivo:
-                    if not pin_input or pin_input != str(cuenta.pin_final):
-                        return "❌ PIN inválido o sin permiso."
-                    else:    
-                        filtros.append("Un nuevo dispositivo está usando tu cuenta")
-
-                if cuenta.filtro_netflix:
-                    filtros.append("Netflix: Tu código de inicio de sesión")
-                if cuenta.filtro_actualizar_hogar:
-                    filtros.append("Confirmación: Se ha confirmado tu Hogar con Netflix")
-                if cuenta.filtro_codigo_temporal:
-                    filtros.append("Tu código de acceso temporal de Netflix")
-
-            else:
-                return "❌ Esta cuenta no tiene cliente asociado."
-
-
-        else:
-            return "❌ Esta cuenta no existe."
-
-        if not filtros:
-            return "❌ No hay filtros activos para esta cuenta."
-
-        print("========== DEBUG ==========")
-        print(f"Correo buscado: {correo_input}")
-        print(f"Filtros activos: {filtros}")
-        print("===========================")
-
-        try:
-            mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-            mail.login(IMAP_USER, IMAP_PASS)
-            mail.select("inbox")
-
-            status, data = mail.search(None, f'(TO "{correo_input}")')
-            ids = data[0].split()
-
-            html_body = None
-
-            for num in reversed(ids):
-                typ, msg_data = mail.fetch(num, '(RFC822)')
-                raw_email = msg_data[0][1]
-                msg = email.message_from_bytes(raw_email)
-
-                asunto = email.header.decode_header(msg["Subject"])[0][0]
-                if isinstance(asunto, bytes):
-                    asunto = asunto.decode(errors="replace")
-                asunto = asunto.lower().strip()
-
-                if any(f.lower() in asunto for f in filtros):
-                    if msg.is_multipart():
-                        for part in msg.walk():
-                            ctype = part.get_content_type()
-                            charset = part.get_content_charset() or "utf-8"
-                            if ctype == "text/html":
-                                html_body = part.get_payload(decode=True).decode(charset, errors="replace")
-                                break
-                            elif ctype == "text/plain" and not html_body:
-                                html_body = f"<pre>{part.get_payload(decode=True).decode(charset, errors='replace')}</pre>"
-                    else:
-                        charset = msg.get_content_charset() or "utf-8"
-                        if msg.get_content_type() == "text/html":
-                            html_body = msg.get_payload(decode=True).decode(charset, errors="replace")
-                        else:
-                            html_body = f"<pre>{msg.get_payload(decode=True).decode(charset, errors='replace')}</pre>"
-                    break
-
-            mail.logout()
-
-            if html_body:
-                html_body = html_body.encode().decode('unicode_escape')
-
-            return render_template(
-                'busqueda_resultado.html',
-                cliente=cuenta.cliente if cuenta else None,
-                cuentas=[cuenta] if cuenta else [],
-                mensaje=html_body or "✅ No se encontró coincidencia, pero la conexión IMAP funcionó."
-            )
-
-        except Exception as e:
-            return f"❌ Error IMAP: {str(e)}"
-
-
-    # --------------------------
-    # 🚀 Local
-    # --------------------------
-    if __name__ == "__main__":
-        with app.app_context():
-            db.create_all()
-        app.run(host='0.0.0.0', port=5000)
-
+    app.cli.add_command(recalcular_estadisticas)
+    app.cli.add_command(reportar_vencidas)
+    return app
+
+
+def _ajuste(app, nombre, defecto):
+    # config de create_app() primero, luego la variable de entorno
+    valor = app.config.get(nombre)
+    if valor is None:
+        valor = os.getenv(nombre, defecto)
+    return str(int(valor)) if isinstance(valor, bool) else str(valor)
+
+
+# --------------------------
+# ⌨️ Comandos flask
+# --------------------------
+@click.command("recalcular-estadisticas")
+@with_appcontext
+def recalcular_estadisticas():
+    """Recalcula todos los contadores del dashboard desde las tablas."""
+    antes = db.session.get(Estadisticas, 1)
+    antes = {nombre: getattr(antes, nombre) for nombre in estadisticas.CONTADORES} if antes else {}
+    fila = estadisticas.recalcular()
+    for nombre in estadisticas.CONTADORES:
+        valor = getattr(fila, nombre)
+        aviso = "" if antes.get(nombre, valor) == valor else f"  (tenía {antes[nombre]})"
+        print(f"{nombre}: {valor}{aviso}")
+
+
+@click.command("reportar-vencidas")
+@click.option("--tipo", type=click.Choice([reportes.MAYORISTAS, reportes.FINALES]), default=None,
+              help="Solo mayoristas o solo clientes finales (por defecto ambos).")
+@click.option("--dias", type=click.IntRange(min=0), default=None,
+              help="Cuentas que vencen en los próximos N días en vez de las vencidas.")
+@click.option("--formato", type=click.Choice(["csv", "json"]), default="csv")
+@click.option("--salida", type=click.File("w", encoding="utf-8"), default="-",
+              help="Archivo de salida (por defecto la consola).")
+@with_appcontext
+def reportar_vencidas(tipo, dias, formato, salida):
+    """Mensajes y enlaces wa.me de cuentas vencidas de todos los clientes."""
+    tipos = (tipo,) if tipo else (reportes.MAYORISTAS, reportes.FINALES)
+    filas = reportes.reporte(tipos, dias)
+    for trozo in (reportes.como_json if formato == "json" else reportes.como_csv)(filas):
+        salida.write(trozo)
@@ -0,0 +1,108 @@
+# --------------------------
+# ⏱️ Arranque en frío: import de main y primer request
+# --------------------------
+# Uso: python benchmarks/bench_arranque.py [repeticiones] [modulo]
+#
+# Cada medición es un intérprete nuevo (como un contenedor recién levantado)
+# con una BD SQLite temporal, así no depende del .env ni de Postgres. Muestra
+# la mediana de: import de `modulo` (main por defecto), tiempo hasta la
+# respuesta del primer GET / y, de una corrida con `python -X importtime`,
+# los módulos que más pesan.
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOP_MODULOS = 15
+# Solo deben cargarse en el camino que los usa, nunca al importar main
+PEREZOSOS = ("alembic", "flask_migrate", "bs4", "smtplib", "email.mime.text", "imap_async", "apscheduler")
+
+# Corre dentro del intérprete hijo
+MEDIR = """
+import json, sys, time
+inicio = time.perf_counter()
+modulo = __import__(sys.argv[1])
+importado = time.perf_counter()
+respuesta = modulo.app.test_client().get("/")
+listo = time.perf_counter()
+assert respuesta.status_code == 200, respuesta.status_code
+print(json.dumps({"import": importado - inicio, "primer_request": listo - inicio}))
+"""
+
+
+def entorno(carpeta):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(carpeta, 'bench.db')}"
+    env["LOG_NIVEL"] = "WARNING"
+    env["INDEXADOR_EN_WEB"] = "0"
+    env["ESTADISTICAS_PROGRAMADAS"] = "0"
+    return env
+
+
+def medir(modulo, env):
+    # Tiempos internos del hijo más el total de pared (intérprete incluido)
+    inicio = time.perf_counter()
+    salida = subprocess.run(
+        [sys.executable, "-c", MEDIR, modulo],
+        cwd=RAIZ, env=env, capture_output=True, text=True, check=True,
+    )
+    tiempos = json.loads(salida.stdout.strip().splitlines()[-1])
+    tiempos["proceso"] = time.perf_counter() - inicio
+    return tiempos
+
+
+def interprete_vacio(env):
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return time.perf_counter() - inicio
+
+
+def importtime(modulo, env):
+    # Líneas "import time: propio | acumulado | nombre" (en microsegundos)
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, env=env, capture_output=True, text=True, check=True,
+    )
+    modulos = []
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.append((int(propio), int(acumulado), nombre.rstrip()))
+    return modulos
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    modulo = sys.argv[2] if len(sys.argv) > 2 else "main"
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        env = entorno(carpeta)
+        medir(modulo, env)  # la primera crea cachés de bytecode; no cuenta
+        base = [interprete_vacio(env) for _ in range(repeticiones)]
+        tiempos = [medir(modulo, env) for _ in range(repeticiones)]
+        modulos = importtime(modulo, env)
+
+    def mediana(clave):
+        return statistics.median(t[clave] for t in tiempos) * 1000
+
+    print(f"{modulo}: {repeticiones} arranques en frío (mediana)")
+    print(f"  intérprete vacío      : {statistics.median(base) * 1000:8.1f} ms")
+    print(f"  import {modulo:<15}: {mediana('import'):8.1f} ms")
+    print(f"  hasta el primer GET / : {mediana('primer_request'):8.1f} ms (desde el import)")
+    print(f"  proceso completo      : {mediana('proceso'):8.1f} ms")
+
+    print("\nMódulos con más tiempo propio (python -X importtime):")
+    for propio, acumulado, nombre in sorted(modulos, reverse=True)[:TOP_MODULOS]:
+        print(f"  {propio / 1000:7.1f} ms  (acum. {acumulado / 1000:7.1f} ms)  {nombre.strip()}")
+
+    cargados = sorted({nombre.strip() for _, _, nombre in modulos} & set(PEREZOSOS))
+    print(f"\nMódulos perezosos cargados al arrancar: {', '.join(cargados) or 'ninguno'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# --------------------------
+# ⏱️ Micro-benchmark: extractores compilados vs BeautifulSoup
+# --------------------------
+# Uso: python benchmarks/bench_extractores.py [repeticiones]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractores import EXTRACTORES, extraer
+from corpus import corpus, casos_codigo
+
+
+def medir(funcion, correos, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for opcion, html_body in correos:
+            funcion(opcion, html_body)
+    return (time.perf_counter() - inicio) / (repeticiones * len(correos))
+
+
+def solo_bs4(opcion, html_body):
+    extractor = EXTRACTORES[opcion]
+    valor = extractor.buscar_bs4(html_body)
+    return extractor.error if valor is None else extractor.plantilla.format(valor)
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    correos = corpus()
+    tamano = sum(len(h) for _, h in correos) / len(correos)
+
+    for html_body, esperado in casos_codigo():
+        for buscar in (EXTRACTORES["netflix"].buscar, EXTRACTORES["netflix"].buscar_bs4):
+            valor = buscar(html_body)
+            if valor != esperado:
+                sys.exit(f"❌ {buscar.__qualname__} devolvió {valor} en vez de {esperado}:\n  {html_body[:200]}")
+
+    # Donde BeautifulSoup encuentra algo, el extractor debe dar lo mismo.
+    # (find(string=...) no ve anclas con el texto dentro de un <span>.)
+    solo_rapido = 0
+    for opcion, html_body in correos:
+        rapido = extraer(opcion, html_body, fallback=False)
+        lento = solo_bs4(opcion, html_body)
+        if lento == EXTRACTORES[opcion].error and rapido != lento:
+            solo_rapido += 1
+        elif rapido != lento:
+            sys.exit(f"❌ Resultado distinto para {opcion}:\n  {rapido}\n  {lento}")
+
+    t_rapido = medir(lambda o, h: extraer(o, h, fallback=False), correos, repeticiones)
+    t_bs4 = medir(solo_bs4, correos, repeticiones)
+
+    print(f"{len(correos)} correos, {tamano / 1024:.1f} KB de HTML en promedio")
+    print(f"extractores:   {t_rapido * 1e6:10.1f} µs/correo")
+    print(f"BeautifulSoup: {t_bs4 * 1e6:10.1f} µs/correo")
+    print(f"aceleración:   {t_bs4 / t_rapido:10.1f}x")
+    print(f"solo los encuentra el extractor: {solo_rapido}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# --------------------------
+# 📬 Corpus de correos con la forma de los de Netflix
+# --------------------------
+# Estructura típica: <head> con mucho CSS, preheader oculto, tablas anidadas
+# con estilos en línea, el botón/código en el centro y un pie legal largo con
+# varios enlaces, con unas decenas de KB de HTML por correo como en el buzón real.
+
+CSS = """
+<style type="text/css">
+  body { margin:0; padding:0; -webkit-text-size-adjust:100%; }
+  table, td { border-collapse:collapse; mso-table-lspace:0pt; mso-table-rspace:0pt; }
+  img { border:0; height:auto; line-height:100%; outline:none; text-decoration:none; }
+  @media only screen and (min-width: 1024px) { .container { width:600px !important; z-index: 1000; } }
+  @media only screen and (max-width: 500px) {
+    .container { width:100% !important; }
+    .content-padding { padding-left:24px !important; padding-right:24px !important; }
+    .h1 { font-size:28px !important; line-height:32px !important; }
+  }
+  .footer-link { color:#a9a6a6 !important; text-decoration:underline; }
+</style>
+"""
+
+FILA_RELLENO = """
+<tr><td class="content-padding" align="left" style="padding:0 40px 0 40px;">
+  <table width="100%" border="0" cellpadding="0" cellspacing="0" role="presentation">
+    <tr><td style="font-family:NetflixSans-Regular,Helvetica,Roboto,Segoe UI,sans-serif;font-size:14px;line-height:20px;color:#221f1f;padding-top:20px;">
+      Si tienes preguntas, visita el <a href="https://help.netflix.com/es/?g=fila{n}" style="color:#221f1f;text-decoration:underline;">Centro de ayuda</a>.
+    </td></tr>
+  </table>
+</td></tr>
+"""
+
+PIE = """
+<tr><td style="padding:20px 40px;font-family:Helvetica,Arial,sans-serif;font-size:11px;line-height:14px;color:#a9a6a6;">
+  Este mensaje se envió a [{correo}] como parte de tu membresía de Netflix.<br>
+  <a class="footer-link" href="https://www.netflix.com/notificationsettings?g=pie{n}">Preferencias de notificaciones</a> |
+  <a class="footer-link" href="https://help.netflix.com/legal/termsofuse?g=pie{n}">Términos de uso</a> |
+  <a class="footer-link" href="https://help.netflix.com/legal/privacy?g=pie{n}">Privacidad</a> |
+  <a class="footer-link" href="https://help.netflix.com/es/contactus?g=pie{n}">Centro de ayuda</a><br>
+  Netflix International B.V. SRC: 48291_es_PE. Ref. {n}
+</td></tr>
+"""
+
+CENTROS = {
+    "actualizar_hogar": """
+<tr><td class="h1" style="font-size:36px;line-height:40px;font-weight:bold;padding-top:20px;">Cómo actualizar tu Hogar con Netflix</td></tr>
+<tr><td style="padding-top:20px;font-size:16px;">Recibimos una solicitud para actualizar el Hogar con Netflix de la cuenta de {correo}. ¿La enviaste tú?</td></tr>
+<tr><td align="center" style="padding-top:24px;">
+  <table border="0" cellpadding="0" cellspacing="0"><tr><td align="center" bgcolor="#e50914" style="border-radius:4px;">
+    <a href="https://www.netflix.com/account/update-primary-location?nftoken=BgjStOvcAxKqAm{token}&amp;g=A1B2C3&amp;lnktrk=EVO" style="font-size:14px;color:#ffffff;text-decoration:none;display:inline-block;padding:12px 24px;">Sí, la envié yo</a>
+  </td></tr></table>
+</td></tr>
+<tr><td style="padding-top:20px;">Si no fuiste tú, <a href="https://www.netflix.com/password?g=no{token}">cambia la contraseña</a>.</td></tr>
+""",
+    "codigo_temporal": """
+<tr><td class="h1" style="font-size:36px;line-height:40px;font-weight:bold;padding-top:20px;">Tu código de acceso temporal</td></tr>
+<tr><td style="padding-top:20px;font-size:16px;">Solicitaste un código de acceso temporal para un dispositivo de viaje. El código vence en 15 minutos.</td></tr>
+<tr><td align="center" style="padding-top:24px;">
+  <table border="0" cellpadding="0" cellspacing="0"><tr><td align="center" bgcolor="#e50914" style="border-radius:4px;">
+    <a href="https://www.netflix.com/account/travel/verify?nftoken=BgjStOvcAxKqAm{token}&amp;messageGuid=5d1c&amp;lnktrk=EVO" style="font-size:14px;color:#ffffff;text-decoration:none;display:inline-block;padding:12px 24px;">
+      <span>Obtener código</span>
+    </a>
+  </td></tr></table>
+</td></tr>
+""",
+    "dispositivo": """
+<tr><td class="h1" style="font-size:36px;line-height:40px;font-weight:bold;padding-top:20px;">Un nuevo dispositivo está usando tu cuenta</td></tr>
+<tr><td style="padding-top:20px;font-size:16px;">Smart TV · Lima, Perú · 12 de marzo a las 21:14 (GMT-5)</td></tr>
+<tr><td style="padding-top:20px;">Si no fuiste tú, te recomendamos
+  <a href="https://www.netflix.com/password?g=dev{token}&amp;lnktrk=EVO" style="color:#e50914;">cambiar la contraseña</a> de inmediato.
+</td></tr>
+""",
+    "netflix": """
+<tr><td class="h1" style="font-size:36px;line-height:40px;font-weight:bold;padding-top:20px;">Ingresa este código para iniciar sesión</td></tr>
+<tr><td style="padding-top:20px;font-size:16px;">Ingresa este código en tu dispositivo para iniciar sesión.</td></tr>
+<tr><td align="left" style="padding-top:24px;font-size:28px;letter-spacing:6px;font-weight:bold;">{codigo}</td></tr>
+<tr><td style="padding-top:20px;">El código vence en 15 minutos.</td></tr>
+""",
+}
+
+
+def correo_html(opcion, n=0, filas=40):
+    token = "%08x" % (n * 2654435761 & 0xffffffff)
+    correo = f"cliente{n}@ejemplo.com"
+    partes = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Netflix 2024</title>", CSS * 3, "</head><body>",
+        "<!-- plantilla 7321 -->",
+        "<div style='display:none;max-height:0;overflow:hidden;'>Netflix&nbsp;&zwnj;&nbsp;&zwnj;" + "&nbsp;&zwnj;" * 80 + "</div>",
+        "<table width='100%' border='0' cellpadding='0' cellspacing='0'><tr><td align='center'>",
+        "<table class='container' width='500' border='0' cellpadding='0' cellspacing='0'>",
+        "<tr><td style='padding:20px 40px;'><a href='https://www.netflix.com/browse?g=logo'><img src='https://assets.nflxext.com/logo.png' width='24' alt='Netflix'></a></td></tr>",
+        CENTROS[opcion].format(correo=correo, token=token, codigo="%04d" % (n * 37 % 10000)),
+    ]
+    partes.extend(FILA_RELLENO.format(n=i) for i in range(filas // 2))
+    partes.append(PIE.format(correo=correo, n=n))
+    partes.extend(FILA_RELLENO.format(n=i) for i in range(filas // 2, filas))
+    partes.append("</table></td></tr></table></body></html>")
+    return "".join(partes)
+
+
+def corpus(por_opcion=25):
+    return [(opcion, correo_html(opcion, n, filas=20 + (n % 5) * 20))
+            for opcion in CENTROS for n in range(por_opcion)]
+
+
+# Correos de código con cifras de 4 dígitos fuera del texto visible: el
+# extractor debe devolver el código real, no el CSS ni el año del <title>.
+TRAMPAS_CODIGO = [
+    ("<html><head><style>@media (max-width: 1024px) { .h1 { z-index: 9999; } }</style></head>"
+     "<body><td>Tu código: 4821</td></body></html>", "4821"),
+    ("<html><head><title>Netflix 2024</title></head><body><p>Código 0937</p></body></html>", "0937"),
+    ("<body><style type='text/css'>.a{width:1200px}</style><script>var t=5555;</script>"
+     "<!-- 2025 --><td style='width:1024px'>6112</td></body>", "6112"),
+]
+
+
+def casos_codigo():
+    return TRAMPAS_CODIGO + [(correo_html("netflix", n), "%04d" % (n * 37 % 10000)) for n in range(1, 6)]
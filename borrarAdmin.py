@@ -1,7 +1,9 @@
 # borrarAdmin.py
-from app import app
+from app import create_app
 from models import db, AdminUser
 
+app = create_app()
+
 with app.app_context():
     admin = AdminUser.query.filter_by(username="admin").first()
     if admin:
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+from consultas_imap import ejecutar, pasos_buscar_ultimo, pasos_uids_desde, pasos_proximo_uid
+
+
+class _Entrada:
+    __slots__ = ("uidvalidity", "uidnext", "uid", "resultado", "creada")
+
+    def __init__(self, uidvalidity, uidnext, uid, resultado):
+        self.uidvalidity = uidvalidity
+        self.uidnext = uidnext
+        self.uid = uid
+        self.resultado = resultado
+        self.creada = time.monotonic()
+
+    def avanzada(self, uidnext):
+        # Misma entrada con el cursor más adelante (sin alargar su vida)
+        entrada = _Entrada(self.uidvalidity, uidnext, self.uid, self.resultado)
+        entrada.creada = self.creada
+        return entrada
+
+
+# --------------------------
+# 📌 Caché por (correo, opcion) con cursor de UID
+# --------------------------
+class CacheConsultas:
+    def __init__(self, max_entradas=2000, ttl=300):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if time.monotonic() - entrada.creada > self.ttl:
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return entrada
+
+    def guardar(self, clave, entrada):
+        with self._lock:
+            self._datos[clave] = entrada
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, correo):
+        with self._lock:
+            for clave in [c for c in self._datos if c[0] == correo]:
+                del self._datos[clave]
+
+    # --------------------------
+    # 🔁 Consulta incremental: solo se miran los UIDs posteriores al cursor
+    # --------------------------
+    def consultar(self, mail, correo, opcion, filtros, extraer, modo="cabeceras", horas=None):
+        raw_email, resultado, pendiente = ejecutar(
+            self.pasos_consultar(mail.uidvalidity, correo, opcion, filtros, modo, horas), mail
+        )
+        if pendiente is not None:
+            resultado = extraer(raw_email) if raw_email is not None else None
+            self.registrar(pendiente, resultado)
+        return resultado
+
+    def pasos_consultar(self, uidvalidity, correo, opcion, filtros, modo="cabeceras", horas=None):
+        # Devuelve (mensaje, resultado, pendiente). Si pendiente no es None hubo
+        # escaneo: quien llama extrae el resultado del mensaje y lo registra.
+        # uidvalidity es el que dio el SELECT de la sesión (mail.uidvalidity).
+        # El cursor se lee antes de buscar: lo que llegue durante la búsqueda
+        # queda por encima y se revisa en la siguiente consulta.
+        clave = (correo, opcion)
+        entrada = self.obtener(clave)
+
+        if entrada and entrada.uidvalidity == uidvalidity:
+            nuevos = yield from pasos_uids_desde(entrada.uidnext)
+            if not nuevos:
+                return None, entrada.resultado, None
+            uidnext = max(nuevos) + 1
+            uid, raw_email = yield from pasos_buscar_ultimo(correo, filtros, modo, horas, desde_uid=entrada.uidnext)
+            if raw_email is None:
+                # No llegó nada nuevo que coincida: se avanza el cursor y se conserva el resultado.
+                self.guardar(clave, entrada.avanzada(uidnext))
+                return None, entrada.resultado, None
+        else:
+            uidnext = yield from pasos_proximo_uid()
+            uid, raw_email = yield from pasos_buscar_ultimo(correo, filtros, modo, horas)
+
+        return raw_email, None, (clave, uidvalidity, uidnext, uid)
+
+    def registrar(self, pendiente, resultado):
+        clave, uidvalidity, uidnext, uid = pendiente
+        self.guardar(clave, _Entrada(uidvalidity, uidnext, uid, resultado))
@@ -0,0 +1,302 @@
+import re
+from datetime import datetime, timedelta, timezone
+from email.header import decode_header
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+
+from extractores import extraer, EXTRACTORES
+from mime_stream import primera_parte, cabeceras, aplanar_fetch, estructura, seccion_texto, envolver
+
+
+# --------------------------
+# 📌 Categorías de correo (opción → texto del asunto)
+# --------------------------
+# El orden importa: "inicio de sesión" es el más genérico y va al final.
+CATEGORIAS = {
+    "actualizar_hogar": "Importante: Cómo actualizar tu Hogar con Netflix",
+    "codigo_temporal": "código de acceso temporal",
+    "dispositivo": "nuevo dispositivo está usando tu cuenta",
+    "netflix": "inicio de sesión",
+}
+
+# Horas hacia atrás que vale la pena mirar por opción (None = todo el historial).
+# Se pueden cambiar con IMAP_VENTANAS="codigo_temporal=4,actualizar_hogar=24".
+VENTANAS_HORAS = {
+    "actualizar_hogar": 24,
+    "codigo_temporal": 4,
+    "dispositivo": 72,
+    "netflix": 4,
+}
+
+SIN_RESULTADO = "✅ No se encontró correo válido para esta consulta."
+
+UID_RE = re.compile(rb"UID (\d+)")
+
+
+def decodificar_asunto(valor):
+    if not valor:
+        return ""
+    partes = []
+    for texto, charset in decode_header(valor):
+        if isinstance(texto, bytes):
+            # Asuntos con UTF-8 crudo llegan como "unknown-8bit"
+            if not charset or charset == "unknown-8bit":
+                charset = "utf-8"
+            try:
+                texto = texto.decode(charset, errors="replace")
+            except LookupError:
+                texto = texto.decode("utf-8", errors="replace")
+        partes.append(texto)
+    return "".join(partes).lower().strip()
+
+
+def categoria_de(asunto):
+    for opcion, texto in CATEGORIAS.items():
+        if texto.lower() in asunto:
+            return opcion
+    return None
+
+
+def coincide(asunto, filtros):
+    return any(f.lower() in asunto for f in filtros)
+
+
+def cargar_ventanas(texto):
+    for par in (texto or "").split(","):
+        if "=" in par:
+            opcion, horas = par.split("=", 1)
+            horas = horas.strip()
+            VENTANAS_HORAS[opcion.strip()] = float(horas) if horas and horas != "0" else None
+
+
+def ventana_para(opciones):
+    # Con varias opciones (/buscar) se usa la ventana más amplia.
+    horas = [VENTANAS_HORAS.get(o) for o in opciones]
+    if not horas or None in horas:
+        return None
+    return max(horas)
+
+
+# --------------------------
+# 🧮 Constructor del SEARCH: TO + OR SUBJECT ... + SINCE
+# --------------------------
+def cadena_imap(texto):
+    return '"' + texto.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def termino_asunto(filtro):
+    # SUBJECT con acentos exigiría CHARSET + literales; basta el tramo ASCII
+    # más largo del filtro, la coincidencia exacta se revisa luego en local.
+    tramos = re.split(r"[^\x20-\x7e]+", filtro)
+    return max((t.strip() for t in tramos), key=len, default="")
+
+
+def criterio_busqueda(correo_input, filtros, horas=None, desde_uid=None):
+    partes = [f"TO {cadena_imap(correo_input)}"]
+    if desde_uid:
+        partes.insert(0, f"UID {desde_uid}:*")
+
+    terminos = [termino_asunto(f) for f in filtros]
+    if filtros and all(terminos):
+        asuntos = [f"SUBJECT {cadena_imap(t)}" for t in dict.fromkeys(terminos)]
+        # OR es binario en IMAP: OR a OR b c
+        while len(asuntos) > 1:
+            b = asuntos.pop()
+            a = asuntos.pop()
+            asuntos.append(f"OR {a} {b}")
+        partes.append(asuntos[0])
+
+    if horas:
+        # SINCE solo entiende fechas (en la zona del servidor): se deja un día
+        # de margen y la hora exacta se filtra en local con la cabecera Date.
+        desde = datetime.now(timezone.utc) - timedelta(hours=horas, days=1)
+        partes.append(f"SINCE {desde.strftime('%d-%b-%Y')}")
+
+    return "(" + " ".join(partes) + ")"
+
+
+def dentro_de_ventana(fecha, horas):
+    if not horas or not fecha:
+        return True
+    try:
+        fecha = parsedate_to_datetime(fecha)
+    except (TypeError, ValueError):
+        return True
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - fecha <= timedelta(hours=horas)
+
+
+# --------------------------
+# 📄 Cuerpo HTML del correo (o texto plano envuelto en <pre>)
+# --------------------------
+def cuerpo_html(raw_email):
+    # Solo se decodifica la primera parte text/html (o text/plain); ver mime_stream.
+    ctype, texto = primera_parte(raw_email)
+    if texto is None:
+        return None
+    if ctype == "text/html":
+        return texto
+    return f"<pre>{texto}</pre>"
+
+
+def conjunto_uids(uids):
+    # [1, 2, 3, 7, 9, 10] -> "1:3,7,9:10" para no mandar comandos gigantes
+    rangos = []
+    for uid in sorted(uids):
+        if rangos and uid == rangos[-1][1] + 1:
+            rangos[-1][1] = uid
+        else:
+            rangos.append([uid, uid])
+    return ",".join(str(a) if a == b else f"{a}:{b}" for a, b in rangos)
+
+
+def fragmentos_fetch(data):
+    # imaplib devuelve (b'n (UID x BODY[...] {len}', literal) y a veces los
+    # datos (UID, INTERNALDATE...) llegan después del literal, en el fragmento
+    # b' UID x)' siguiente: se juntan en (metadatos, literal).
+    anterior = None
+    for item in data:
+        if isinstance(item, tuple):
+            if anterior is not None:
+                yield anterior
+            anterior = item
+        elif anterior is not None:
+            yield (anterior[0] + item if item else anterior[0]), anterior[1]
+            anterior = None
+    if anterior is not None:
+        yield anterior
+
+
+def respuestas_fetch(data):
+    for metadatos, literal in fragmentos_fetch(data):
+        uid = UID_RE.search(metadatos)
+        if uid:
+            yield int(uid.group(1)), literal
+
+
+# --------------------------
+# 📬 Búsqueda del último correo que coincide con los filtros
+# --------------------------
+# La lógica se escribe como generadores que piden comandos IMAP con
+# `yield (metodo, args)` y reciben la respuesta (typ, data). Así el mismo
+# código sirve para imaplib (ejecutar) y para el motor asyncio (imap_async).
+def ejecutar(pasos, mail):
+    try:
+        metodo, args = next(pasos)
+        while True:
+            metodo, args = pasos.send(getattr(mail, metodo)(*args))
+    except StopIteration as fin:
+        return fin.value
+
+
+def ejecutar_con_avisos(pasos, mail):
+    # Como ejecutar, pero es un generador que avisa ("candidatos", n) tras cada
+    # SEARCH; el resultado de los pasos se obtiene con `yield from`.
+    try:
+        metodo, args = next(pasos)
+        while True:
+            typ, data = respuesta = getattr(mail, metodo)(*args)
+            if metodo == "uid" and args[0] == "SEARCH":
+                yield "candidatos", len(data[0].split()) if data and data[0] else 0
+            metodo, args = pasos.send(respuesta)
+    except StopIteration as fin:
+        return fin.value
+
+
+def buscar_ultimo_correo(mail, correo_input, filtros, modo="cabeceras", horas=None):
+    return buscar_ultimo(mail, correo_input, filtros, modo, horas)[1]
+
+
+def buscar_ultimo(mail, correo_input, filtros, modo="cabeceras", horas=None, desde_uid=None):
+    # Devuelve (uid, bytes crudos) del correo más nuevo que coincide, o (None, None).
+    return ejecutar(pasos_buscar_ultimo(correo_input, filtros, modo, horas, desde_uid), mail)
+
+
+def pasos_buscar_ultimo(correo_input, filtros, modo="cabeceras", horas=None, desde_uid=None):
+    criterio = criterio_busqueda(correo_input, filtros, horas, desde_uid)
+    typ, data = yield "uid", ("SEARCH", None, criterio)
+    uids = [int(u) for u in data[0].split()]
+    if desde_uid:
+        uids = [u for u in uids if u >= desde_uid]
+    if not uids:
+        return None, None
+
+    if modo == "completo":
+        return (yield from _pasos_secuencial(uids, filtros, horas))
+
+    # 1️⃣ Un solo FETCH con solo las cabeceras de todos los candidatos
+    typ, data = yield "uid", ("FETCH", conjunto_uids(uids), "(UID BODY.PEEK[HEADER.FIELDS (SUBJECT DATE)])")
+    ganador = elegir_ganador(data, filtros, horas)
+    if ganador is None:
+        return None, None
+
+    # 2️⃣ Del ganador solo se pide la estructura...
+    typ, data = yield "uid", ("FETCH", str(ganador), "(UID BODYSTRUCTURE)")
+    seccion = seccion_texto(estructura(aplanar_fetch(data)))
+    if seccion is None:
+        # Estructura rara o sin partes de texto: se descarga entero como antes
+        typ, data = yield "uid", ("FETCH", str(ganador), "(BODY.PEEK[])")
+        for uid, literal in respuestas_fetch(data):
+            return uid, literal
+        return None, None
+
+    # 3️⃣ ...y se descarga únicamente la sección text/html (o text/plain)
+    numero, ctype, cte, charset = seccion
+    typ, data = yield "uid", ("FETCH", str(ganador), f"(UID BODY.PEEK[{numero}])")
+    for uid, literal in respuestas_fetch(data):
+        return uid, envolver(literal, ctype, cte, charset)
+    return None, None
+
+
+def elegir_ganador(data, filtros, horas=None):
+    parser = BytesHeaderParser()
+    ganador = None
+    for uid, literal in respuestas_fetch(data):
+        if ganador is not None and uid < ganador:
+            continue
+        encabezado = parser.parsebytes(literal)
+        if coincide(decodificar_asunto(encabezado["Subject"]), filtros) and dentro_de_ventana(encabezado["Date"], horas):
+            ganador = uid
+    return ganador
+
+
+def _pasos_secuencial(uids, filtros, horas=None):
+    for uid in reversed(uids):
+        typ, msg_data = yield "uid", ("FETCH", str(uid), '(UID RFC822)')
+        for _, raw_email in respuestas_fetch(msg_data):
+            msg = cabeceras(raw_email)
+            if coincide(decodificar_asunto(msg["Subject"]), filtros) and dentro_de_ventana(msg["Date"], horas):
+                return uid, raw_email
+    return None, None
+
+
+def pasos_uids_desde(desde_uid):
+    # UIDs >= desde_uid del buzón seleccionado. No se usa STATUS: sobre el buzón
+    # ya seleccionado (RFC 3501 §6.3.10) algunos servidores dan un UIDNEXT viejo.
+    # "UID n:*" siempre devuelve el último UID aunque sea menor que n: se filtra.
+    typ, data = yield "uid", ("SEARCH", None, f"UID {desde_uid}:*")
+    return [u for u in (int(x) for x in data[0].split()) if u >= desde_uid]
+
+
+def pasos_proximo_uid():
+    # UID que tendrá el próximo correo: el último existente + 1
+    typ, data = yield "uid", ("SEARCH", None, "UID *")
+    uids = [int(x) for x in data[0].split()] if data and data[0] else []
+    return max(uids, default=0) + 1
+
+
+# --------------------------
+# 🔎 Extrae el enlace o código según la opción (ver extractores.py)
+# --------------------------
+def extraer_mensaje(opcion, html_body):
+    return extraer(opcion, html_body) or SIN_RESULTADO
+
+
+def extraer_primero(opciones, html_body):
+    # El código o enlace de la primera opción que lo tenga en el correo, o None
+    for opcion in opciones:
+        valor = extraer(opcion, html_body)
+        if valor is not None and valor != EXTRACTORES[opcion].error:
+            return valor
+    return None
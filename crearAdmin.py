@@ -1,7 +1,9 @@
 # crearAdmin.py
-from app import app
+from app import create_app
 from models import db, AdminUser
 
+app = create_app()
+
 # ✅ Pide datos por teclado
 username = input("👤 Usuario: ")
 email = input("📧 Correo: ")
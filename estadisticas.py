@@ -0,0 +1,138 @@
+from datetime import datetime, date
+
+from sqlalchemy import func, select
+
+from models import db, Cliente, ClienteFinal, Cuenta, Estadisticas
+
+CONTADORES = (
+    "total_clientes", "total_clientes_finales", "total_cuentas",
+    "total_mayoristas", "total_finales", "cuentas_vencidas",
+)
+
+
+# --------------------------
+# 📊 Lectura: una fila, sin COUNT por visita
+# --------------------------
+def leer():
+    hoy = date.today()
+    fila = db.session.get(Estadisticas, 1)
+    if fila is None:
+        fila = recalcular()
+    elif fila.fecha_vencidas != hoy:
+        # Cambió el día y el job nocturno no corrió (o corrió en otro proceso)
+        fila = recalcular_vencidas()
+    return {nombre: getattr(fila, nombre) for nombre in CONTADORES}
+
+
+# --------------------------
+# 🔄 Recalcular desde cero (CLI y job nocturno)
+# --------------------------
+def _conteo_vencidas(hoy):
+    return select(func.count(Cuenta.id)).where(Cuenta.fecha_expiracion < hoy).scalar_subquery()
+
+
+def recalcular():
+    hoy = date.today()
+    fila = db.session.execute(select(
+        select(func.count(Cliente.id)).scalar_subquery(),
+        select(func.count(func.distinct(Cuenta.cliente_final_id)))
+        .join(ClienteFinal, ClienteFinal.id == Cuenta.cliente_final_id).scalar_subquery(),
+        select(func.count(Cuenta.id)).scalar_subquery(),
+        select(func.count(Cuenta.id)).where(Cuenta.cliente_id.isnot(None)).scalar_subquery(),
+        select(func.count(Cuenta.id)).where(Cuenta.cliente_final_id.isnot(None)).scalar_subquery(),
+        _conteo_vencidas(hoy),
+    )).one()
+
+    estadisticas = db.session.get(Estadisticas, 1) or Estadisticas(id=1)
+    for nombre, valor in zip(CONTADORES, fila):
+        setattr(estadisticas, nombre, valor or 0)
+    estadisticas.fecha_vencidas = hoy
+    estadisticas.recalculado = datetime.now()
+    db.session.add(estadisticas)
+    db.session.commit()
+    return estadisticas
+
+
+def recalcular_vencidas():
+    hoy = date.today()
+    estadisticas = db.session.get(Estadisticas, 1)
+    if estadisticas is None:
+        return recalcular()
+    estadisticas.cuentas_vencidas = db.session.execute(select(_conteo_vencidas(hoy))).scalar()
+    estadisticas.fecha_vencidas = hoy
+    db.session.commit()
+    return estadisticas
+
+
+# --------------------------
+# ➕ Ajustes incrementales (dentro de la misma transacción que el cambio)
+# --------------------------
+def ajustar(**deltas):
+    # UPDATE estadisticas SET x = x + n: atómico aunque haya varios workers.
+    # Si la fila aún no existe no hace nada; leer() la crea completa.
+    cambios = {getattr(Estadisticas, nombre): getattr(Estadisticas, nombre) + n for nombre, n in deltas.items() if n}
+    if cambios:
+        db.session.query(Estadisticas).filter_by(id=1).update(cambios, synchronize_session=False)
+
+
+def vencida(fecha_expiracion, hoy=None):
+    return fecha_expiracion is not None and fecha_expiracion < (hoy or date.today())
+
+
+def deltas_cuentas(cuentas, signo=1):
+    hoy = date.today()
+    deltas = dict.fromkeys(("total_cuentas", "total_mayoristas", "total_finales", "cuentas_vencidas"), 0)
+    for cuenta in cuentas:
+        deltas["total_cuentas"] += signo
+        if cuenta.cliente_id is not None:
+            deltas["total_mayoristas"] += signo
+        if cuenta.cliente_final_id is not None:
+            deltas["total_finales"] += signo
+        if vencida(cuenta.fecha_expiracion, hoy):
+            deltas["cuentas_vencidas"] += signo
+    return deltas
+
+
+def cuentas_agregadas(cuentas):
+    # Llamar después de flush: los clientes finales cuentan desde su primera cuenta
+    deltas = deltas_cuentas(cuentas)
+    finales = {c.cliente_final_id for c in cuentas if c.cliente_final_id is not None}
+    deltas["total_clientes_finales"] = sum(1 for cf in finales if _cuentas_de_final(cf) == _nuevas(cuentas, cf))
+    ajustar(**deltas)
+
+
+def cuentas_eliminadas(cuentas):
+    # Llamar antes de borrar: el cliente final deja de contar con su última cuenta
+    deltas = deltas_cuentas(cuentas, -1)
+    finales = {c.cliente_final_id for c in cuentas if c.cliente_final_id is not None}
+    deltas["total_clientes_finales"] = -sum(1 for cf in finales if _cuentas_de_final(cf) == _nuevas(cuentas, cf))
+    ajustar(**deltas)
+
+
+def vencimiento_cambiado(antes, despues):
+    hoy = date.today()
+    ajustar(cuentas_vencidas=int(vencida(despues, hoy)) - int(vencida(antes, hoy)))
+
+
+def _cuentas_de_final(cliente_final_id):
+    return db.session.query(func.count(Cuenta.id)).filter(Cuenta.cliente_final_id == cliente_final_id).scalar()
+
+
+def _nuevas(cuentas, cliente_final_id):
+    return sum(1 for c in cuentas if c.cliente_final_id == cliente_final_id)
+
+
+# --------------------------
+# 🌙 Job nocturno (APScheduler)
+# --------------------------
+def programar_recalculo(app, hora=0, minuto=5):
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    def job():
+        with app.app_context():
+            recalcular_vencidas()
+
+    programador = BackgroundScheduler(daemon=True)
+    programador.add_job(job, "cron", hour=hora, minute=minuto, id="recalcular_vencidas", replace_existing=True)
+    programador.start()
+    return programador
@@ -0,0 +1,108 @@
+import re
+from html import unescape
+
+
+# --------------------------
+# 📌 Registro de extractores por opción
+# --------------------------
+# Cada extractor recorre el HTML con expresiones precompiladas y se detiene en
+# la primera coincidencia, sin construir un DOM. Si no encuentra nada se
+# intenta con BeautifulSoup antes de dar el mensaje de error.
+EXTRACTORES = {}
+
+ANCLA_RE = re.compile(r"<a\b([^>]*)>(.*?)</a\s*>", re.I | re.S)
+HREF_RE = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+ETIQUETA_RE = re.compile(r"<[^>]*>")
+# Lo que no se ve: <head> (con <title> y <style>), <style>/<script> sueltos y comentarios
+INVISIBLE_RE = re.compile(r"<!--.*?-->|<(head|style|script|title)\b[^>]*>.*?</\1\s*>", re.I | re.S)
+TEXTO_RE = re.compile(r"(?:^|>)([^<]+)")
+CODIGO_RE = re.compile(r"\b(\d{4})\b")
+
+
+def registrar(opcion, extractor):
+    EXTRACTORES[opcion] = extractor
+
+
+class ExtractorEnlace:
+    # Busca el primer <a> cuyo texto coincide y devuelve su href.
+    def __init__(self, patron_texto, plantilla, error):
+        self.patron = re.compile(patron_texto, re.I)
+        self.plantilla = plantilla
+        self.error = error
+
+    def buscar(self, html_body):
+        for ancla in ANCLA_RE.finditer(html_body):
+            texto = unescape(ETIQUETA_RE.sub("", ancla.group(2)))
+            if not self.patron.search(texto):
+                continue
+            href = HREF_RE.search(ancla.group(1))
+            if href:
+                valor = href.group(1) or href.group(2) or href.group(3)
+                if valor:
+                    return unescape(valor)
+        return None
+
+    def buscar_bs4(self, html_body):
+        from bs4 import BeautifulSoup
+        link = BeautifulSoup(html_body, 'html.parser').find('a', string=self.patron)
+        if link and link.get('href'):
+            return link['href']
+        return None
+
+
+def visible(html_body):
+    return INVISIBLE_RE.sub(" ", html_body)
+
+
+class ExtractorCodigo:
+    # Busca el primer código de 4 dígitos en el texto visible: el CSS del
+    # <head> (@media (max-width: 1024px)) o un año en el <title> no cuentan.
+    def __init__(self, plantilla, error):
+        self.plantilla = plantilla
+        self.error = error
+
+    def buscar(self, html_body):
+        for texto in TEXTO_RE.finditer(visible(html_body)):
+            match = CODIGO_RE.search(unescape(texto.group(1)))
+            if match:
+                return match.group(1)
+        return None
+
+    def buscar_bs4(self, html_body):
+        from bs4 import BeautifulSoup
+        match = CODIGO_RE.search(BeautifulSoup(visible(html_body), 'html.parser').get_text())
+        return match.group(1) if match else None
+
+
+registrar("actualizar_hogar", ExtractorEnlace(
+    r"Sí, la envié yo",
+    "🔗 Para actualizar tu hogar haz clic aquí: {}",
+    "❌ No se encontró el enlace del botón para actualizar hogar.",
+))
+registrar("codigo_temporal", ExtractorEnlace(
+    r"Obtener código",
+    "🔑 Para código temporal haz clic aquí: {}",
+    "❌ No se encontró el enlace del botón para código temporal.",
+))
+registrar("dispositivo", ExtractorEnlace(
+    r"cambi[a-z]* la contraseña",
+    "🔒 Para restablecer tu contraseña haz clic aquí: {}",
+    "❌ No se encontró el enlace del botón para restablecer contraseña.",
+))
+registrar("netflix", ExtractorCodigo(
+    "✅ Tu código de Netflix es: {}",
+    "❌ No se encontró código numérico en el correo.",
+))
+
+
+def extraer(opcion, html_body, fallback=True):
+    extractor = EXTRACTORES.get(opcion)
+    if extractor is None:
+        return None
+    html_body = html_body or ""
+    valor = extractor.buscar(html_body)
+    if valor is None and fallback:
+        valor = extractor.buscar_bs4(html_body)
+    if valor is None:
+        return extractor.error
+    return extractor.plantilla.format(valor)
@@ -0,0 +1,50 @@
+# gunicorn.conf.py: perfil de producción (gunicorn lo lee solo si se arranca
+# desde esta carpeta; el Procfile y el Dockerfile lo pasan con -c igualmente).
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+# --------------------------
+# 🧵 Workers con hilos
+# --------------------------
+# Casi todo el tiempo de una consulta es esperar a IMAP, así que cada worker
+# atiende varias a la vez con hilos. Cada proceso abre su propio pool IMAP
+# (IMAP_POOL_SIZE): workers x IMAP_POOL_SIZE no debe pasar del límite de
+# conexiones simultáneas del buzón (Gmail: 15).
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() + 1, 4)))
+threads = int(os.getenv("GUNICORN_HILOS", 8))
+
+# Se importa la app una vez en el maestro y los workers la heredan al hacer
+# fork (copy-on-write). Los pools IMAP se rehacen solos al detectar otro pid;
+# el de la BD se suelta en post_fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# --------------------------
+# ⏱️ Tiempos
+# --------------------------
+# /buscar puede esperar a IMAP hasta CONSULTA_ESPERA_MAX (25 s) más la conexión
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Mayor que el idle timeout del balanceador (60 s típico) para que no reuse un
+# socket que gunicorn ya cerró; con gthread una conexión ociosa no ocupa hilo.
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 75))
+
+# Reciclar workers de vez en cuando acota cualquier fuga de memoria
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_NIVEL", "info").lower()
+
+
+def post_fork(server, worker):
+    # Conexiones a la BD abiertas por el maestro (p. ej. el job de estadísticas)
+    # no se pueden compartir entre procesos: el worker empieza con pool vacío.
+    if preload_app:
+        from models import db
+        app = server.app.wsgi()  # la app ya cargada por preload (main:app o admin:app)
+        with app.app_context():
+            db.engine.dispose(close=False)
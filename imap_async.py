@@ -0,0 +1,279 @@
+import asyncio
+import itertools
+import os
+import re
+import ssl
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from consultas_imap import pasos_buscar_ultimo, cadena_imap
+
+LITERAL_RE = re.compile(rb"\{(\d+)\}$")
+UIDVALIDITY_RE = re.compile(rb"\[UIDVALIDITY (\d+)\]")
+
+
+class ErrorImap(Exception):
+    pass
+
+
+class ConexionRota(ErrorImap):
+    pass
+
+
+ERRORES_CONEXION = (ConexionRota, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError)
+
+
+async def ejecutar_async(pasos, cliente):
+    # Igual que consultas_imap.ejecutar, pero esperando cada comando.
+    try:
+        metodo, args = next(pasos)
+        while True:
+            respuesta = await getattr(cliente, metodo)(*args)
+            metodo, args = pasos.send(respuesta)
+    except StopIteration as fin:
+        return fin.value
+
+
+# --------------------------
+# 📌 Cliente IMAP mínimo sobre asyncio (lo que usan las consultas)
+# --------------------------
+class ClienteImapAsync:
+    def __init__(self, servidor, puerto, timeout=30):
+        self.servidor = servidor
+        self.puerto = puerto
+        self.timeout = timeout
+        self.ultimo_uso = time.monotonic()
+        self._tags = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._reader = None
+        self._writer = None
+        self.uidvalidity = None
+
+    async def conectar(self, usuario, clave, carpeta="inbox"):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.servidor, self.puerto, ssl=ssl.create_default_context()),
+            self.timeout,
+        )
+        saludo = await self._leer_linea()
+        if not saludo.startswith(b"* OK"):
+            raise ConexionRota(f"Saludo IMAP inesperado: {saludo!r}")
+        await self._comando("LOGIN", cadena_imap(usuario), cadena_imap(clave))
+        respuestas = await self._comando("SELECT", carpeta)
+        # "* OK [UIDVALIDITY n]": no cambia mientras la sesión siga seleccionada
+        for linea in respuestas.get("OK", []):
+            encontrado = UIDVALIDITY_RE.search(linea if isinstance(linea, bytes) else linea[0])
+            if encontrado:
+                self.uidvalidity = int(encontrado.group(1))
+
+    async def uid(self, comando, *args):
+        comando = comando.upper()
+        respuestas = await self._comando("UID", comando, *(a for a in args if a is not None))
+        if comando == "SEARCH":
+            return "OK", respuestas.get("SEARCH", [b""])
+        return "OK", respuestas.get(comando, [])
+
+    async def status(self, carpeta, elementos):
+        respuestas = await self._comando("STATUS", carpeta, elementos)
+        return "OK", respuestas.get("STATUS", [b""])
+
+    async def noop(self):
+        await self._comando("NOOP")
+        return "OK", [b""]
+
+    async def logout(self):
+        try:
+            await self._comando("LOGOUT")
+        finally:
+            self._writer.close()
+
+    def abortar(self):
+        # Sin LOGOUT: la conexión puede tener una respuesta a medio leer
+        if self._writer is not None:
+            self._writer.close()
+
+    async def _leer_linea(self):
+        linea = await asyncio.wait_for(self._reader.readline(), self.timeout)
+        if not linea:
+            raise ConexionRota("El servidor IMAP cerró la conexión")
+        return linea.rstrip(b"\r\n")
+
+    async def _comando(self, *partes):
+        async with self._lock:
+            tag = b"A%04d" % next(self._tags)
+            self._writer.write(tag + b" " + " ".join(partes).encode() + b"\r\n")
+            await self._writer.drain()
+
+            respuestas = {}
+            while True:
+                linea = await self._leer_linea()
+                if linea.startswith(tag + b" "):
+                    self.ultimo_uso = time.monotonic()
+                    estado = linea[len(tag) + 1:].split(b" ", 1)[0]
+                    if estado != b"OK":
+                        raise ErrorImap(linea.decode(errors="replace"))
+                    return respuestas
+                if linea.startswith(b"* BYE"):
+                    raise ConexionRota(linea.decode(errors="replace"))
+                if linea.startswith(b"* "):
+                    await self._respuesta_sin_tag(linea[2:], respuestas)
+
+    async def _respuesta_sin_tag(self, linea, respuestas):
+        # Mismo formato que imaplib: (b'1 (UID 5 BODY[] {n}', literal), b')'
+        elementos = []
+        actual = linea
+        while True:
+            literal = LITERAL_RE.search(actual)
+            if not literal:
+                break
+            contenido = await asyncio.wait_for(self._reader.readexactly(int(literal.group(1))), self.timeout)
+            elementos.append((actual, contenido))
+            actual = await self._leer_linea()
+        if actual or not elementos:
+            elementos.append(actual)
+
+        cabecera = elementos[0][0] if isinstance(elementos[0], tuple) else elementos[0]
+        partes = cabecera.split(b" ", 2)
+        if partes[0].isdigit() and len(partes) > 1:
+            tipo = partes[1]
+            sin_tipo = partes[0] + (b" " + partes[2] if len(partes) > 2 else b"")
+        else:
+            tipo = partes[0]
+            sin_tipo = cabecera[len(tipo) + 1:]
+        if isinstance(elementos[0], tuple):
+            elementos[0] = (sin_tipo, elementos[0][1])
+        else:
+            elementos[0] = sin_tipo
+        respuestas.setdefault(tipo.decode().upper(), []).extend(elementos)
+
+
+# --------------------------
+# 📌 Pool asyncio: pocas conexiones para cientos de consultas concurrentes
+# --------------------------
+class PoolImapAsync:
+    def __init__(self, servidor, puerto, usuario, clave, carpeta="inbox",
+                 max_conexiones=4, keepalive=60, timeout=30,
+                 reintentos=4, backoff_base=0.5, backoff_max=8):
+        self.servidor = servidor
+        self.puerto = puerto
+        self.usuario = usuario
+        self.clave = clave
+        self.carpeta = carpeta
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._libres = asyncio.LifoQueue()
+        self._cupos = asyncio.Semaphore(max_conexiones)
+
+    async def _conectar(self):
+        ultimo_error = None
+        for intento in range(self.reintentos):
+            cliente = ClienteImapAsync(self.servidor, self.puerto, self.timeout)
+            try:
+                await cliente.conectar(self.usuario, self.clave, self.carpeta)
+                return cliente
+            except (ErrorImap,) + ERRORES_CONEXION as e:
+                ultimo_error = e
+                if intento < self.reintentos - 1:
+                    await asyncio.sleep(min(self.backoff_max, self.backoff_base * (2 ** intento)))
+        raise ultimo_error
+
+    async def _sano(self, cliente):
+        if time.monotonic() - cliente.ultimo_uso < self.keepalive:
+            return True
+        try:
+            await cliente.noop()
+            return True
+        except (ErrorImap,) + ERRORES_CONEXION:
+            return False
+
+    async def _tomar(self):
+        while True:
+            try:
+                cliente = self._libres.get_nowait()
+            except asyncio.QueueEmpty:
+                return await self._conectar()
+            if await self._sano(cliente):
+                return cliente
+            await self._cerrar(cliente)
+
+    async def _cerrar(self, cliente):
+        try:
+            await asyncio.wait_for(cliente.logout(), 5)
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def conexion(self):
+        async with self._cupos:
+            cliente = await self._tomar()
+            try:
+                yield cliente
+            except ERRORES_CONEXION:
+                await self._cerrar(cliente)
+                raise
+            except BaseException:
+                # Cancelado (wait_for, timeout de quien llama) a mitad de un comando:
+                # su respuesta con tag sigue en el socket y confundiría al siguiente.
+                cliente.abortar()
+                raise
+            else:
+                self._libres.put_nowait(cliente)
+
+
+# --------------------------
+# 🚀 Motor: event loop en un hilo propio al que las vistas envían corutinas
+# --------------------------
+class MotorImapAsync:
+    def __init__(self, servidor, puerto, usuario, clave, **opciones_pool):
+        self._config = (servidor, puerto, usuario, clave)
+        self._opciones_pool = opciones_pool
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self.pool = None
+
+    def _asegurar_loop(self):
+        # Se arranca al primer uso (y de nuevo tras un fork de gunicorn).
+        if self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="imap-async", daemon=True).start()
+                self.pool = asyncio.run_coroutine_threadsafe(self._crear_pool(), loop).result()
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop
+
+    async def _crear_pool(self):
+        return PoolImapAsync(*self._config, **self._opciones_pool)
+
+    def enviar(self, corutina):
+        return asyncio.run_coroutine_threadsafe(corutina, self._asegurar_loop())
+
+    def ejecutar(self, corutina, timeout=None):
+        return self.enviar(corutina).result(timeout)
+
+    # --------------------------
+    # 🔎 Pasos de la consulta en versión async
+    # --------------------------
+    async def buscar_ultimo(self, correo, filtros, modo="cabeceras", horas=None, desde_uid=None):
+        async with self.pool.conexion() as cliente:
+            return await ejecutar_async(pasos_buscar_ultimo(correo, filtros, modo, horas, desde_uid), cliente)
+
+    async def extraer(self, funcion, *args):
+        # El parseo y la extracción son CPU: van a un hilo para no frenar el loop.
+        return await asyncio.get_running_loop().run_in_executor(None, funcion, *args)
+
+    async def consultar(self, cache, correo, opcion, filtros, extraer, modo="cabeceras", horas=None):
+        async with self.pool.conexion() as cliente:
+            raw_email, resultado, pendiente = await ejecutar_async(
+                cache.pasos_consultar(cliente.uidvalidity, correo, opcion, filtros, modo, horas), cliente
+            )
+        if pendiente is not None:
+            resultado = await self.extraer(extraer, raw_email) if raw_email is not None else None
+            cache.registrar(pendiente, resultado)
+        return resultado
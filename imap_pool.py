@@ -0,0 +1,180 @@
+import imaplib
+import os
+import queue
+import socket
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Errores que invalidan la sesión IMAP: la conexión se descarta y se abre otra.
+ERRORES_CONEXION = (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError, ssl.SSLError, socket.timeout)
+
+
+class PoolAgotado(Exception):
+    pass
+
+
+class _Conexion:
+    def __init__(self, mail):
+        self.mail = mail
+        self.ultimo_uso = time.monotonic()
+
+
+# --------------------------
+# 📌 Pool de sesiones IMAP autenticadas y con INBOX seleccionado
+# --------------------------
+class ImapPool:
+    def __init__(self, servidor, puerto, usuario, clave, carpeta="inbox",
+                 max_conexiones=4, keepalive=60, espera=10, timeout=30,
+                 reintentos=4, backoff_base=0.5, backoff_max=8):
+        self.servidor = servidor
+        self.puerto = puerto
+        self.usuario = usuario
+        self.clave = clave
+        self.carpeta = carpeta
+        self.max_conexiones = max_conexiones
+        self.keepalive = keepalive
+        self.espera = espera
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._reiniciar()
+
+    def _reiniciar(self):
+        # Se llama también tras un fork (gunicorn): los sockets del padre no se comparten.
+        self._pid = os.getpid()
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(self.max_conexiones)
+        self._lock = threading.Lock()
+        self._hilo_keepalive = None
+        self._cerrado = False
+
+    def _verificar_proceso(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reiniciar()
+
+    # --------------------------
+    # 🔌 Conexión con reintentos y backoff exponencial
+    # --------------------------
+    def _conectar(self):
+        ultimo_error = None
+        for intento in range(self.reintentos):
+            try:
+                mail = imaplib.IMAP4_SSL(self.servidor, self.puerto, timeout=self.timeout)
+                mail.login(self.usuario, self.clave)
+                mail.select(self.carpeta)
+                # UIDVALIDITY del SELECT: no cambia mientras la sesión siga seleccionada.
+                # Si el servidor no lo manda queda None (la caché lo compara igual).
+                uidvalidity = mail.response("UIDVALIDITY")[1][0]
+                mail.uidvalidity = int(uidvalidity) if uidvalidity is not None else None
+                return _Conexion(mail)
+            except ERRORES_CONEXION as e:
+                ultimo_error = e
+                # Tras el último intento no se espera: el cupo del pool sigue tomado
+                if intento < self.reintentos - 1:
+                    time.sleep(min(self.backoff_max, self.backoff_base * (2 ** intento)))
+        raise ultimo_error
+
+    def _sana(self, conexion):
+        mail = conexion.mail
+        if mail.state != "SELECTED":
+            return False
+        if time.monotonic() - conexion.ultimo_uso < self.keepalive:
+            return True
+        try:
+            typ, _ = mail.noop()
+            return typ == "OK"
+        except ERRORES_CONEXION:
+            return False
+
+    def _cerrar(self, conexion):
+        try:
+            conexion.mail.logout()
+        except Exception:
+            pass
+
+    def _tomar(self):
+        self._verificar_proceso()
+        self._iniciar_keepalive()
+        if not self._cupos.acquire(timeout=self.espera):
+            raise PoolAgotado("❌ No hay conexiones IMAP disponibles.")
+        try:
+            while True:
+                try:
+                    conexion = self._libres.get_nowait()
+                except queue.Empty:
+                    return self._conectar()
+                if self._sana(conexion):
+                    return conexion
+                self._cerrar(conexion)
+        except BaseException:
+            self._cupos.release()
+            raise
+
+    def _devolver(self, conexion, rota=False):
+        if rota or self._cerrado:
+            self._cerrar(conexion)
+        else:
+            conexion.ultimo_uso = time.monotonic()
+            self._libres.put(conexion)
+        self._cupos.release()
+
+    @contextmanager
+    def conexion(self):
+        conexion = self._tomar()
+        try:
+            yield conexion.mail
+        except ERRORES_CONEXION:
+            self._devolver(conexion, rota=True)
+            raise
+        except BaseException:
+            self._devolver(conexion)
+            raise
+        else:
+            self._devolver(conexion)
+
+    # --------------------------
+    # 💓 NOOP periódico a las conexiones ociosas
+    # --------------------------
+    def _iniciar_keepalive(self):
+        if self._hilo_keepalive is not None or not self.keepalive:
+            return
+        with self._lock:
+            if self._hilo_keepalive is None:
+                self._hilo_keepalive = threading.Thread(target=self._bucle_keepalive, daemon=True)
+                self._hilo_keepalive.start()
+
+    def _bucle_keepalive(self):
+        while not self._cerrado:
+            time.sleep(self.keepalive)
+            # Cada conexión revisada ocupa un cupo, así el pool nunca supera su tamaño.
+            revisadas = []
+            while self._cupos.acquire(blocking=False):
+                try:
+                    revisadas.append(self._libres.get_nowait())
+                except queue.Empty:
+                    self._cupos.release()
+                    break
+            for conexion in revisadas:
+                if time.monotonic() - conexion.ultimo_uso < self.keepalive:
+                    self._libres.put(conexion)
+                    self._cupos.release()
+                    continue
+                try:
+                    conexion.mail.noop()
+                    self._devolver(conexion)
+                except ERRORES_CONEXION:
+                    self._devolver(conexion, rota=True)
+
+    def cerrar(self):
+        self._cerrado = True
+        while True:
+            try:
+                self._cerrar(self._libres.get_nowait())
+            except queue.Empty:
+                break
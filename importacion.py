@@ -0,0 +1,137 @@
+import csv
+import io
+import re
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import insert
+
+from models import db, Cuenta, normalizar_correo
+from permisos import cache_permisos
+import estadisticas
+
+CORREO_RE = re.compile(r"^[^@\s]+@[^@\s]+$")
+COLUMNAS_CORREO = ("correo", "email", "e-mail", "mail")
+MUESTRA_OMITIDOS = 20
+
+
+# --------------------------
+# 📥 Fuentes: texto pegado o CSV (se leen de a poco, nunca enteros)
+# --------------------------
+def correos_de_texto(texto):
+    for linea in (texto or "").splitlines():
+        yield linea
+
+
+def correos_de_csv(flujo, encoding="utf-8-sig"):
+    # Acepta un CSV con cabecera (columna correo/email) o una columna sin cabecera.
+    if not isinstance(flujo, io.TextIOBase):
+        flujo = io.TextIOWrapper(flujo, encoding=encoding, errors="replace", newline="")
+    lector = csv.reader(flujo)
+    columna = 0
+    for numero, fila in enumerate(lector):
+        if not fila:
+            continue
+        if numero == 0:
+            cabecera = [c.strip().lower() for c in fila]
+            for nombre in COLUMNAS_CORREO:
+                if nombre in cabecera:
+                    columna = cabecera.index(nombre)
+                    break
+            else:
+                if len(fila) > columna:
+                    yield fila[columna]
+            continue
+        if len(fila) > columna:
+            yield fila[columna]
+
+
+# --------------------------
+# 🚀 Importación por lotes
+# --------------------------
+def _insertar(filas):
+    # Devuelve los correo_normalizado realmente insertados. Con ON CONFLICT DO
+    # NOTHING, si otro proceso metió el mismo correo entre el SELECT y el INSERT
+    # la fila se salta sin romper el lote.
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    elif dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    else:
+        db.session.execute(insert(Cuenta.__table__), filas)  # executemany
+        return [fila["correo_normalizado"] for fila in filas]
+
+    sentencia = (
+        insert_dialecto(Cuenta.__table__)
+        .on_conflict_do_nothing(index_elements=["correo_normalizado"])
+        .returning(Cuenta.__table__.c.correo_normalizado)
+    )
+    return db.session.execute(sentencia, filas).scalars().all()
+
+
+def _validos(correos, omitir):
+    # (normalizado, correo) de cada correo válido, una sola vez por importación
+    vistos = set()
+    for correo in correos:
+        correo = (correo or "").strip()
+        if not correo:
+            continue
+        normalizado = normalizar_correo(correo)
+        if not CORREO_RE.match(normalizado):
+            omitir("invalidas", correo)
+        elif normalizado in vistos:
+            omitir("repetidas", correo)
+        else:
+            vistos.add(normalizado)
+            yield normalizado, correo
+
+
+def importar_cuentas(correos, cliente_id, lote=1000, dias=30):
+    # Salta los existentes con un SELECT ... IN por lote e inserta el resto en
+    # un executemany. Cada lote se confirma por separado, así una lista enorme
+    # no mantiene una transacción abierta (ni todo el archivo en memoria).
+    hoy = datetime.now().date()
+    resumen = {"insertadas": 0, "existentes": 0, "repetidas": 0, "invalidas": 0, "omitidos": []}
+
+    def omitir(motivo, correo):
+        resumen[motivo] += 1
+        if len(resumen["omitidos"]) < MUESTRA_OMITIDOS:
+            resumen["omitidos"].append({"correo": correo, "motivo": motivo})
+
+    pares = _validos(correos, omitir)
+    while True:
+        bloque = dict(islice(pares, lote))
+        if not bloque:
+            break
+
+        existentes = {
+            normalizado for (normalizado,) in
+            db.session.query(Cuenta.correo_normalizado).filter(Cuenta.correo_normalizado.in_(list(bloque)))
+        }
+        for normalizado in existentes:
+            omitir("existentes", bloque.pop(normalizado))
+        if not bloque:
+            continue
+
+        insertadas = _insertar([{
+            "correo": correo,
+            "correo_normalizado": normalizado,
+            "fecha_compra": hoy,
+            "fecha_expiracion": hoy + timedelta(days=dias),
+            "activo": True,
+            "filtro_netflix": True,
+            "filtro_dispositivo": True,
+            "filtro_actualizar_hogar": True,
+            "filtro_codigo_temporal": True,
+            "cliente_id": cliente_id,
+        } for normalizado, correo in bloque.items()])
+        for normalizado in set(bloque) - set(insertadas):
+            omitir("existentes", bloque[normalizado])
+
+        estadisticas.ajustar(total_cuentas=len(insertadas), total_mayoristas=len(insertadas))
+        db.session.commit()
+        cache_permisos.invalidar(*insertadas)
+        resumen["insertadas"] += len(insertadas)
+
+    return resumen
@@ -0,0 +1,217 @@
+import imaplib
+import logging
+import select
+import threading
+from datetime import datetime, timedelta
+from email.utils import getaddresses
+
+from models import db, CorreoIndexado, EstadoIndexador
+from consultas_imap import (
+    decodificar_asunto, categoria_de, cuerpo_html, extraer_mensaje,
+    conjunto_uids, fragmentos_fetch, respuestas_fetch, UID_RE,
+)
+from imap_pool import ERRORES_CONEXION
+from mime_stream import cabeceras
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------
+# 📌 Consultas contra el índice (camino rápido de /buscar y /api/consulta_hogar)
+# --------------------------
+def indice_activo(frescura):
+    # Solo se confía en el índice si el indexador dio señales de vida hace poco.
+    estado = db.session.get(EstadoIndexador, 1)
+    if not estado or not estado.latido:
+        return False
+    return datetime.now() - estado.latido < timedelta(seconds=frescura)
+
+
+def buscar_en_indice(correo, opciones, horas=None):
+    consulta = CorreoIndexado.query.filter(
+        CorreoIndexado.destinatario == correo,
+        CorreoIndexado.categoria.in_(opciones),
+    )
+    if horas:
+        consulta = consulta.filter(CorreoIndexado.fecha_llegada >= datetime.now() - timedelta(hours=horas))
+    return (
+        consulta
+        .order_by(CorreoIndexado.fecha_llegada.desc(), CorreoIndexado.uid.desc())
+        .first()
+    )
+
+
+# --------------------------
+# 🔄 Indexador: sigue el INBOX con IDLE (o sondeo) y guarda cada correo una vez
+# --------------------------
+class Indexador:
+    def __init__(self, app, servidor, puerto, usuario, clave, carpeta="inbox",
+                 intervalo=60, retencion_dias=7, lote=50, timeout=30):
+        self.app = app
+        self.servidor = servidor
+        self.puerto = puerto
+        self.usuario = usuario
+        self.clave = clave
+        self.carpeta = carpeta
+        self.intervalo = intervalo
+        self.retencion_dias = retencion_dias
+        self.lote = lote
+        self.timeout = timeout
+        self._hilo = None
+        self._detener = threading.Event()
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self.ejecutar, name="indexador", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def ejecutar(self):
+        espera = 1
+        while not self._detener.is_set():
+            try:
+                with self.app.app_context():
+                    self._seguir_buzon()
+                espera = 1
+            except ERRORES_CONEXION as e:
+                logger.warning("Indexador desconectado (%s), reintentando en %ss", e, espera)
+                self._detener.wait(espera)
+                espera = min(espera * 2, 60)
+            except Exception:
+                logger.exception("Error en el indexador")
+                self._detener.wait(espera)
+                espera = min(espera * 2, 60)
+
+    def _seguir_buzon(self):
+        mail = imaplib.IMAP4_SSL(self.servidor, self.puerto, timeout=self.timeout)
+        try:
+            mail.login(self.usuario, self.clave)
+            mail.select(self.carpeta)
+            # UIDVALIDITY no cambia mientras el buzón siga seleccionado.
+            typ, data = mail.response("UIDVALIDITY")
+            uidvalidity = int(data[0])
+            soporta_idle = "IDLE" in mail.capabilities
+            while not self._detener.is_set():
+                self._sincronizar(mail, uidvalidity)
+                if soporta_idle:
+                    self._idle(mail, self.intervalo)
+                else:
+                    self._detener.wait(self.intervalo)
+                    mail.noop()
+        finally:
+            try:
+                mail.logout()
+            except Exception:
+                pass
+
+    # --------------------------
+    # 💤 IDLE (RFC 2177): espera hasta que llegue algo o pase el intervalo
+    # --------------------------
+    def _idle(self, mail, segundos):
+        tag = mail._new_tag()
+        mail.send(tag + b" IDLE\r\n")
+        respuesta = mail.readline()
+        if not respuesta.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE rechazado: {respuesta!r}")
+        sock = mail.socket()
+        pendiente = getattr(sock, "pending", lambda: 0)()
+        if not pendiente:
+            select.select([sock], [], [], segundos)
+        mail.send(b"DONE\r\n")
+        while True:
+            linea = mail.readline()
+            if not linea:
+                raise imaplib.IMAP4.abort("Conexión cerrada durante IDLE")
+            if linea.startswith(tag):
+                break
+
+    # --------------------------
+    # 📥 Trae los UIDs nuevos y los guarda
+    # --------------------------
+    def _sincronizar(self, mail, uidvalidity):
+        estado = db.session.get(EstadoIndexador, 1)
+        if estado is None:
+            estado = EstadoIndexador(id=1, ultimo_uid=0)
+            db.session.add(estado)
+
+        if estado.uidvalidity != uidvalidity:
+            # El buzón se recreó: los UIDs anteriores ya no significan nada.
+            CorreoIndexado.query.filter(CorreoIndexado.uidvalidity != uidvalidity).delete()
+            estado.uidvalidity = uidvalidity
+            estado.ultimo_uid = 0
+
+        if estado.ultimo_uid:
+            criterio = f"UID {estado.ultimo_uid + 1}:*"
+        else:
+            desde = (datetime.now() - timedelta(days=self.retencion_dias)).strftime("%d-%b-%Y")
+            criterio = f"SINCE {desde}"
+
+        typ, data = mail.uid("SEARCH", None, criterio)
+        # "UID n:*" siempre devuelve al menos el último UID existente aunque sea viejo.
+        uids = sorted(u for u in (int(x) for x in data[0].split()) if u > (estado.ultimo_uid or 0))
+
+        for i in range(0, len(uids), self.lote):
+            bloque = uids[i:i + self.lote]
+            self._indexar_bloque(mail, uidvalidity, bloque)
+            estado.ultimo_uid = bloque[-1]
+            estado.latido = datetime.now()
+            db.session.commit()
+
+        estado.latido = datetime.now()
+        self._purgar()
+        db.session.commit()
+
+    def _indexar_bloque(self, mail, uidvalidity, uids):
+        # 1️⃣ Cabeceras e INTERNALDATE de todo el bloque; solo los correos con
+        # asunto de alguna categoría pasan a 2️⃣ y se descarga su cuerpo.
+        typ, data = mail.uid("FETCH", conjunto_uids(uids), "(UID INTERNALDATE BODY.PEEK[HEADER.FIELDS (SUBJECT TO)])")
+        elegidos = {}
+        for metadatos, literal in fragmentos_fetch(data):
+            try:
+                uid = int(UID_RE.search(metadatos).group(1))
+                msg = cabeceras(literal)
+                asunto = decodificar_asunto(msg["Subject"])
+                categoria = categoria_de(asunto)
+                if categoria is None:
+                    continue
+                fecha = imaplib.Internaldate2tuple(metadatos)
+                destinatarios = {addr.lower() for _, addr in getaddresses(msg.get_all("To", [])) if addr}
+            except Exception:
+                # Un correo raro no debe frenar el bloque: se salta y se sigue
+                logger.warning("Indexador: respuesta FETCH ilegible %r", metadatos[:200], exc_info=True)
+                continue
+            fecha_llegada = datetime(*fecha[:6]) if fecha else datetime.now()
+            elegidos[uid] = (asunto, categoria, fecha_llegada, destinatarios)
+
+        if not elegidos:
+            return
+        typ, data = mail.uid("FETCH", conjunto_uids(elegidos), "(UID BODY.PEEK[])")
+        for uid, raw_email in respuestas_fetch(data):
+            if uid not in elegidos:
+                continue
+            try:
+                self._indexar_mensaje(uidvalidity, uid, raw_email, *elegidos[uid])
+            except Exception:
+                logger.warning("Indexador: no se pudo indexar el UID %s", uid, exc_info=True)
+
+    def _indexar_mensaje(self, uidvalidity, uid, raw_email, asunto, categoria, fecha_llegada, destinatarios):
+        html_body = cuerpo_html(raw_email)
+        resultado = extraer_mensaje(categoria, html_body)
+
+        for destinatario in destinatarios:
+            db.session.add(CorreoIndexado(
+                uidvalidity=uidvalidity,
+                uid=uid,
+                destinatario=destinatario,
+                categoria=categoria,
+                asunto=asunto[:500],
+                resultado=resultado,
+                html=html_body,
+                fecha_llegada=fecha_llegada,
+            ))
+
+    def _purgar(self):
+        limite = datetime.now() - timedelta(days=self.retencion_dias)
+        CorreoIndexado.query.filter(CorreoIndexado.fecha_llegada < limite).delete()
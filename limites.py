@@ -0,0 +1,123 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Limitado(Exception):
+    # reintentar: segundos sugeridos para el Retry-After
+    def __init__(self, mensaje, reintentar):
+        super().__init__(mensaje)
+        self.reintentar = max(1, math.ceil(reintentar))
+
+
+# --------------------------
+# 🪣 Cubetas de tokens por clave (correo o IP)
+# --------------------------
+# Cada clave tiene hasta `rafaga` tokens y recupera `por_minuto` por minuto.
+# Solo se guardan las claves recientes (LRU): una clave olvidada vuelve con la
+# cubeta llena, que es lo mismo que tendría tras esperar.
+class LimitadorTokens:
+    def __init__(self, por_minuto, rafaga, max_claves=50000):
+        self.tasa = por_minuto / 60
+        self.rafaga = rafaga
+        self.max_claves = max_claves
+        self._cubetas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def tomar(self, clave):
+        # Devuelve 0 si hay token; si no, los segundos hasta el próximo.
+        if self.tasa <= 0:
+            return 0
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, antes = self._cubetas.pop(clave, (self.rafaga, ahora))
+            tokens = min(self.rafaga, tokens + (ahora - antes) * self.tasa)
+            espera = 0 if tokens >= 1 else (1 - tokens) / self.tasa
+            if not espera:
+                tokens -= 1
+            self._cubetas[clave] = (tokens, ahora)
+            while len(self._cubetas) > self.max_claves:
+                self._cubetas.popitem(last=False)
+        return espera
+
+    def __len__(self):
+        return len(self._cubetas)
+
+
+# --------------------------
+# 🚦 Tope global de trabajo IMAP simultáneo
+# --------------------------
+class CupoConcurrencia:
+    def __init__(self, maximo, espera=0.5):
+        self.maximo = maximo
+        self.espera = espera
+        self._semaforo = threading.BoundedSemaphore(maximo)
+        self._lock = threading.Lock()
+        self.en_curso = 0
+        self.rechazadas = 0
+
+    def tomar(self, espera=None):
+        # Espera un momento por un hueco; si no aparece, Limitado (→ 429).
+        if not self._semaforo.acquire(timeout=self.espera if espera is None else espera):
+            with self._lock:
+                self.rechazadas += 1
+            raise Limitado("⏳ Hay muchas consultas en curso, intenta en unos segundos.", 2)
+        with self._lock:
+            self.en_curso += 1
+
+    def soltar(self, *_):
+        with self._lock:
+            self.en_curso -= 1
+        self._semaforo.release()
+
+    @contextmanager
+    def reservar(self):
+        self.tomar()
+        try:
+            yield
+        finally:
+            self.soltar()
+
+    def metricas(self):
+        with self._lock:
+            return {"maximo": self.maximo, "en_curso": self.en_curso, "rechazadas": self.rechazadas}
+
+
+# --------------------------
+# 🛂 Admisión de /buscar y /api/consulta_hogar
+# --------------------------
+class Admision:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limitadas = {"correo": 0, "ip": 0}
+        self.configurar()
+
+    def configurar(self, correo_por_minuto=6, correo_rafaga=10, ip_por_minuto=30, ip_rafaga=30,
+                   imap_maximo=8, imap_espera=0.5):
+        # Tasa 0 desactiva ese límite
+        self.por_correo = LimitadorTokens(correo_por_minuto, correo_rafaga)
+        self.por_ip = LimitadorTokens(ip_por_minuto, ip_rafaga)
+        self.cupo_imap = CupoConcurrencia(imap_maximo, imap_espera)
+
+    def verificar(self, correo, ip):
+        # La IP primero: un script probando PINs sobre muchos correos se corta ahí.
+        for nombre, limitador, clave in (("ip", self.por_ip, ip), ("correo", self.por_correo, correo)):
+            espera = limitador.tomar(clave)
+            if espera:
+                with self._lock:
+                    self.limitadas[nombre] += 1
+                raise Limitado("⏳ Demasiadas consultas seguidas, intenta de nuevo en unos segundos.", espera)
+
+    def metricas(self):
+        with self._lock:
+            limitadas = dict(self.limitadas)
+        return {
+            "limitadas": limitadas,
+            "claves": {"correo": len(self.por_correo), "ip": len(self.por_ip)},
+            "imap": self.cupo_imap.metricas(),
+        }
+
+
+admision = Admision()
@@ -1,17 +1,24 @@
 import os
-import imaplib
-import email
-import re
-from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-from threading import Thread
-
-from flask import Flask, request, render_template, Response, jsonify
-from flask_login import LoginManager
-#from app import app
-from models import db, Cliente, Cuenta, AdminUser
-from panelAdmin import panel_bp
+import json
 import time
+from concurrent.futures import wait
+from functools import partial
+from dotenv import load_dotenv
+
+from flask import request, render_template, Response, jsonify, stream_with_context
+from app import create_app
+from models import db, normalizar_correo
+from imap_pool import ImapPool
+from consultas_imap import (
+    buscar_ultimo_correo, cuerpo_html, extraer_mensaje, extraer_primero, ejecutar_con_avisos,
+    cargar_ventanas, ventana_para, SIN_RESULTADO, CATEGORIAS,
+)
+from indexador import Indexador, indice_activo, buscar_en_indice
+from cache_consultas import CacheConsultas
+from trabajos import Trabajos, Saturado
+from permisos import cache_permisos
+from vuelo_unico import consultas_en_vuelo, ConsultaEnCurso
+from limites import admision, Limitado
 
 
 # --------------------------
@@ -23,44 +30,102 @@ IMAP_USER = os.getenv("IMAP_USER")
 IMAP_PASS = os.getenv("IMAP_PASS")
 IMAP_SERVER = os.getenv("IMAP_SERVER")
 IMAP_PORT = int(os.getenv("IMAP_PORT", 993))
+# "cabeceras": un FETCH de asuntos y luego solo el correo ganador; "completo": el escaneo antiguo
+IMAP_ESCANEO = os.getenv("IMAP_ESCANEO", "cabeceras")
+cargar_ventanas(os.getenv("IMAP_VENTANAS"))
 
 # --------------------------
-# 📌 App Flask
+# 📌 Pool IMAP compartido por todas las consultas
 # --------------------------
-app = Flask(__name__)
-app.secret_key = 'TU_SECRET_KEY_PRO'
+imap_pool = ImapPool(
+    IMAP_SERVER, IMAP_PORT, IMAP_USER, IMAP_PASS,
+    max_conexiones=int(os.getenv("IMAP_POOL_SIZE", 4)),
+    keepalive=int(os.getenv("IMAP_KEEPALIVE", 60)),
+    espera=int(os.getenv("IMAP_POOL_TIMEOUT", 10)),
+)
+
+# "hilos": imaplib bloqueante con ImapPool; "asyncio": un event loop multiplexa
+# todas las consultas del proceso sobre pocas conexiones (imap_async)
+IMAP_MOTOR = os.getenv("IMAP_MOTOR", "hilos")
+motor_imap = None
+if IMAP_MOTOR == "asyncio":
+    from imap_async import MotorImapAsync  # asyncio solo si se usa
+
+    motor_imap = MotorImapAsync(
+        IMAP_SERVER, IMAP_PORT, IMAP_USER, IMAP_PASS,
+        max_conexiones=int(os.getenv("IMAP_POOL_SIZE", 4)),
+        keepalive=int(os.getenv("IMAP_KEEPALIVE", 60)),
+    )
+
+# Resultados por (correo, opcion); un reintento solo pregunta por UIDs nuevos
+cache_consultas = CacheConsultas(
+    max_entradas=int(os.getenv("CACHE_CONSULTAS_TAM", 2000)),
+    ttl=int(os.getenv("CACHE_CONSULTAS_TTL", 300)),
+)
 
 # --------------------------
-# 📌 DB config
+# 📌 Consultas de /api/consulta_hogar en un pool acotado de hilos
 # --------------------------
-DATABASE_URL = os.getenv("DATABASE_URL")
-print("DATABASE_URL:", DATABASE_URL)
-if DATABASE_URL:
-    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-else:
-    BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(BASE_DIR, 'instance', 'mi_base.db')}"
+trabajos = Trabajos(
+    max_hilos=int(os.getenv("CONSULTA_HILOS", 8)),
+    max_pendientes=int(os.getenv("CONSULTA_MAX_PENDIENTES", 100)),
+)
+CONSULTA_ESPERA = float(os.getenv("CONSULTA_ESPERA", 8))
+
+# PIN y filtros por correo en memoria; el panel invalida al guardar
+cache_permisos.configurar(
+    max_entradas=int(os.getenv("CACHE_PERMISOS_TAM", 10000)),
+    ttl=int(os.getenv("CACHE_PERMISOS_TTL", 60)),
+)
+CONSULTA_ESPERA_MAX = float(os.getenv("CONSULTA_ESPERA_MAX", 25))
+
+# /buscar/stream: si aún no llegó el correo, cuánto seguir mirando y cada cuánto
+BUSCAR_VIGILAR = float(os.getenv("BUSCAR_VIGILAR", 20))
+BUSCAR_VIGILAR_INTERVALO = float(os.getenv("BUSCAR_VIGILAR_INTERVALO", 3))
 
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+SIN_CORREO_HTML = "<div class='alert alert-warning'>✅ No se encontró ningún correo filtrado para este correo.</div>"
 
 # --------------------------
-# 📌 Login
+# 🛂 Límites: tokens por correo y por IP, y tope de consultas IMAP a la vez
 # --------------------------
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'panel.login'
+# Pasarse da un 429 con Retry-After al instante, antes de tocar la BD o IMAP.
+admision.configurar(
+    correo_por_minuto=float(os.getenv("LIMITE_CORREO_POR_MINUTO", 6)),
+    correo_rafaga=int(os.getenv("LIMITE_CORREO_RAFAGA", 10)),
+    ip_por_minuto=float(os.getenv("LIMITE_IP_POR_MINUTO", 30)),
+    ip_rafaga=int(os.getenv("LIMITE_IP_RAFAGA", 30)),
+    imap_maximo=int(os.getenv("IMAP_CUPO", 8)),
+    imap_espera=float(os.getenv("IMAP_CUPO_ESPERA", 0.5)),
+)
 
-@login_manager.user_loader
-def load_user(user_id):
-    return AdminUser.query.get(int(user_id))
+# --------------------------
+# 📌 App Flask (BD, login y panel vienen de la fábrica)
+# --------------------------
+app = create_app()
 
 # --------------------------
-# 📌 Blueprint
+# 📌 Indexador de correos en segundo plano
 # --------------------------
-app.register_blueprint(panel_bp)
+# INDICE_ACTIVO=1 hace que /buscar y /api/consulta_hogar lean del índice mientras
+# el indexador tenga latido reciente; si se cae, se vuelve a consultar IMAP en vivo.
+INDICE_ACTIVO = os.getenv("INDICE_ACTIVO", "0") == "1"
+INDICE_FRESCURA = int(os.getenv("INDICE_FRESCURA", 180))
+
+indexador_correos = Indexador(
+    app, IMAP_SERVER, IMAP_PORT, IMAP_USER, IMAP_PASS,
+    intervalo=int(os.getenv("INDEXADOR_INTERVALO", 60)),
+    retencion_dias=int(os.getenv("INDEXADOR_RETENCION_DIAS", 7)),
+)
+
+if os.getenv("INDEXADOR_EN_WEB", "0") == "1":
+    indexador_correos.iniciar()
 
 
+@app.cli.command("indexar")
+def indexar():
+    """Sigue el INBOX y llena el índice de correos (proceso dedicado)."""
+    indexador_correos.ejecutar()
+
 # --------------------------
 # 🏠 Index
 # --------------------------
@@ -74,122 +139,111 @@ def index():
 # --------------------------
 def consulta_imap_thread(correo_input, filtros, resultado_dict):
     try:
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        mail.login(IMAP_USER, IMAP_PASS)
-        mail.select("inbox")
-        status, data = mail.search(None, f'(TO "{correo_input}")')
-        ids = data[0].split()
-
-        html_body = None
-
-        for num in ids[::-1]:
-            typ, msg_data = mail.fetch(num, '(RFC822)')
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-
-            asunto = email.header.decode_header(msg["Subject"])[0][0]
-            if isinstance(asunto, bytes):
-                asunto = asunto.decode(errors="replace")
-            asunto = asunto.lower().strip()
-
-            if any(f.lower() in asunto for f in filtros):
-                print("Coincide filtro ✔️")
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        if part.get_content_type() == "text/html":
-                            html_body = part.get_payload(decode=True).decode(errors="replace")
-                            break
-                else:
-                    html_body = msg.get_payload(decode=True).decode(errors="replace")
-
-                soup = BeautifulSoup(html_body, 'html.parser')
-
-                # SIEMPRE muestra el h1 completo
-                h1 = soup.find('h1')
-                if h1:
-                    mensaje_final = f"📢 TITULAR: {h1.get_text(strip=True)}"
-                else:
-                    mensaje_final = f"✅ Coincide filtro pero NO hay <h1>."
-                break
-
-
-        mail.logout()
-        resultado_dict["html"] = html_body
+        with imap_pool.conexion() as mail:
+            raw_email = buscar_ultimo_correo(mail, correo_input, filtros, IMAP_ESCANEO)
+        resultado_dict["html"] = cuerpo_html(raw_email) if raw_email else None
 
     except Exception as e:
         resultado_dict["html"] = f"<div class='alert alert-danger'>❌ Error IMAP: {str(e)}</div>"
 
-def consulta_imap_api_thread(correo_input, filtros, opcion, pin_input, resultado_dict):
-    import re
-    from bs4 import BeautifulSoup
+def consulta_imap_api(correo_input, filtros, opcion):
     try:
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        mail.login(IMAP_USER, IMAP_PASS)
-        mail.select("inbox")
-
-        status, data = mail.search(None, f'(TO "{correo_input}")')
-        ids = data[0].split()
-
-        mensaje_final = "✅ No se encontró correo válido para esta consulta."
-
-        for num in reversed(ids):
-            typ, msg_data = mail.fetch(num, '(RFC822)')
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-
-            asunto = email.header.decode_header(msg["Subject"])[0][0]
-            if isinstance(asunto, bytes):
-                asunto = asunto.decode(errors="replace")
-            asunto = asunto.lower().strip()
-
-            if any(f.lower() in asunto for f in filtros):
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        if part.get_content_type() == "text/html":
-                            html_body = part.get_payload(decode=True).decode(errors="replace")
-                            break
-                else:
-                    html_body = msg.get_payload(decode=True).decode(errors="replace")
-
-                soup = BeautifulSoup(html_body, 'html.parser')
-
-                if opcion == "actualizar_hogar":
-                    link = soup.find('a', string=re.compile(r"Sí, la envié yo", re.I))
-                    if link and link.get('href'):
-                        mensaje_final = f"🔗 Para actualizar tu hogar haz clic aquí: {link['href']}"
-                    else:
-                        mensaje_final = "❌ No se encontró el enlace del botón para actualizar hogar."
-
-                elif opcion == "codigo_temporal":
-                    link = soup.find('a', string=re.compile(r"Obtener código", re.I))
-                    if link and link.get('href'):
-                        mensaje_final = f"🔑 Para código temporal haz clic aquí: {link['href']}"
-                    else:
-                        mensaje_final = "❌ No se encontró el enlace del botón para código temporal."
-
-                elif opcion == "dispositivo":
-                    link = soup.find('a', string=re.compile(r"cambi[a-z]* la contraseña", re.I))
-                    if link and link.get('href'):
-                        mensaje_final = f"🔒 Para restablecer tu contraseña haz clic aquí: {link['href']}"
-                    else:
-                        mensaje_final = "❌ No se encontró el enlace del botón para restablecer contraseña."
-
-
-                elif opcion == "netflix":
-                    body = soup.get_text()
-                    match = re.search(r"\b(\d{4})\b", body)
-                    if match:
-                        mensaje_final = f"✅ Tu código de Netflix es: {match.group(1)}"
-                    else:
-                        mensaje_final = "❌ No se encontró código numérico en el correo."
-
-                break
-
-        mail.logout()
-        resultado_dict["msg"] = mensaje_final
+        with imap_pool.conexion() as mail:
+            mensaje_final = cache_consultas.consultar(
+                mail, correo_input, opcion, filtros,
+                partial(extraer_de_correo, opcion),
+                IMAP_ESCANEO, ventana_para([opcion]),
+            )
+        return mensaje_final or SIN_RESULTADO
 
     except Exception as e:
-        resultado_dict["msg"] = f"❌ Error IMAP: {str(e)}"
+        return f"❌ Error IMAP: {str(e)}"
+
+async def consulta_imap_api_async(correo_input, filtros, opcion):
+    try:
+        mensaje_final = await motor_imap.consultar(
+            cache_consultas, correo_input, opcion, filtros,
+            partial(extraer_de_correo, opcion),
+            IMAP_ESCANEO, ventana_para([opcion]),
+        )
+        return mensaje_final or SIN_RESULTADO
+
+    except Exception as e:
+        return f"❌ Error IMAP: {str(e)}"
+
+def consulta_imap_html(correo_input, clave_cache, filtros, opciones):
+    with admision.cupo_imap.reservar():
+        if IMAP_MOTOR == "asyncio":
+            return motor_imap.ejecutar(motor_imap.consultar(
+                cache_consultas, correo_input, clave_cache, filtros,
+                cuerpo_html, IMAP_ESCANEO, ventana_para(opciones),
+            ), CONSULTA_ESPERA_MAX)
+        with imap_pool.conexion() as mail:
+            return cache_consultas.consultar(
+                mail, correo_input, clave_cache, filtros,
+                cuerpo_html, IMAP_ESCANEO, ventana_para(opciones),
+            )
+
+def con_cupo_imap(crear_futuro):
+    # Sin esperar: se llama con locks tomados (Trabajos y VueloUnico)
+    admision.cupo_imap.tomar(espera=0)
+    try:
+        futuro = crear_futuro()
+    except BaseException:
+        admision.cupo_imap.soltar()
+        raise
+    futuro.add_done_callback(admision.cupo_imap.soltar)
+    return futuro
+
+def respuesta_limitada(e, cuerpo, estado=429):
+    # Limitado → 429; ConsultaEnCurso → 503: ambos con Retry-After
+    cuerpo.status_code = estado
+    cuerpo.headers["Retry-After"] = str(e.reintentar)
+    return cuerpo
+
+def extraer_de_correo(opcion, raw_email):
+    return extraer_mensaje(opcion, cuerpo_html(raw_email))
+
+
+# --------------------------
+# 📌 PIN y filtros de /buscar (también los usa /buscar/stream)
+# --------------------------
+def filtros_busqueda(correo_input, pin_input):
+    # Devuelve (error_html, filtros, opciones); error_html None si se puede buscar
+    permiso = cache_permisos.obtener(correo_input)
+
+    filtros = []
+    opciones = []
+
+    if permiso:
+        if permiso.tipo is None:
+            # Cuenta sin cliente asociado
+            return "<div class='alert alert-danger'>❌ Esta cuenta no tiene cliente asociado.</div>", filtros, opciones
+
+        # ⛔️ Verificamos el PIN primero (del mayorista o el pin_final de la cuenta)
+        if not permiso.pin_valido(pin_input):
+            return "<div class='alert alert-danger'>❌ PIN inválido o sin permiso.</div>", filtros, opciones
+
+        # ✅ Solo si el PIN es correcto, agregamos los filtros
+        if permiso.permite("actualizar_hogar"):
+            filtros.append("Importante: Cómo actualizar tu Hogar con Netflix")
+            opciones.append("actualizar_hogar")
+        if permiso.permite("codigo_temporal"):
+            filtros.append("Tu código de acceso temporal de Netflix")
+            opciones.append("codigo_temporal")
+
+        # ❌ Comentados como pediste
+        # if permiso.permite("netflix"):
+        #     filtros.append("Netflix: Tu código de inicio de sesión")
+        # if permiso.permite("dispositivo"):
+        #     filtros.append("Un nuevo dispositivo está usando tu cuenta")
+
+    else:
+        return "<div class='alert alert-danger'>❌ Esta cuenta no existe.</div>", filtros, opciones
+
+    if not filtros:
+        return "<div class='alert alert-warning'>❌ Consultas Desactivadas :( </div>", filtros, opciones
+    return None, filtros, opciones
 
 
 # --------------------------
@@ -200,110 +254,181 @@ def consulta_imap_api_thread(correo_input, filtros, opcion, pin_input, resultado
 # --------------------------
 @app.route('/buscar', methods=['POST'])
 def buscar():
-    correo_input = request.form.get('correo', '').strip().lower()
+    correo_input = normalizar_correo(request.form.get('correo'))
     pin_input = request.form.get('pin', '').strip()
 
     if not correo_input:
         return Response("<div class='alert alert-danger'>❌ Debes enviar un correo válido.</div>", content_type='text/html; charset=utf-8')
 
-    cuenta = Cuenta.query.filter(db.func.lower(Cuenta.correo) == correo_input).first()
-
-    filtros = []
-
-    if cuenta:
-        if cuenta.cliente:
-            # ⛔️ Verificamos el PIN primero
-            if not pin_input or str(pin_input) != str(cuenta.cliente.pin_restablecer):
-                return Response("<div class='alert alert-danger'>❌ PIN inválido o sin permiso.</div>", content_type='text/html; charset=utf-8')
-
-            # ✅ Solo si el PIN es correcto, agregamos los filtros
-            if cuenta.filtro_actualizar_hogar:
-                filtros.append("Importante: Cómo actualizar tu Hogar con Netflix")
-            if cuenta.filtro_codigo_temporal:
-                filtros.append("Tu código de acceso temporal de Netflix")
-
-            # ❌ Comentados como pediste
-            # if cuenta.filtro_netflix:
-            #     filtros.append("Netflix: Tu código de inicio de sesión")
-            # if cuenta.filtro_dispositivo:
-            #     filtros.append("Un nuevo dispositivo está usando tu cuenta")
-
+    try:
+        admision.verificar(correo_input, request.remote_addr)
+    except Limitado as e:
+        return respuesta_limitada(e, Response(f"<div class='alert alert-warning'>{e}</div>", content_type='text/html; charset=utf-8'))
+
+    error, filtros, opciones = filtros_busqueda(correo_input, pin_input)
+    if error:
+        return Response(error, content_type='text/html; charset=utf-8')
+
+    # ⚡️ Si el indexador está al día, respondemos desde el índice sin tocar IMAP
+    if INDICE_ACTIVO and indice_activo(INDICE_FRESCURA):
+        fila = buscar_en_indice(correo_input, opciones, ventana_para(opciones))
+        mensaje = (fila.html if fila else None) or SIN_CORREO_HTML
+        return Response(mensaje, content_type='text/html; charset=utf-8')
+
+    # /buscar devuelve el HTML completo: su clave no se mezcla con la de la API
+    clave_cache = "html:" + "+".join(opciones)
+    try:
+        # Mismo hogar buscando a la vez: un solo escaneo, los demás esperan su resultado
+        html_body = consultas_en_vuelo.ejecutar(
+            (correo_input, clave_cache), consulta_imap_html, correo_input, clave_cache, filtros, opciones,
+            timeout=CONSULTA_ESPERA_MAX,
+        )
 
+        mensaje = html_body or SIN_CORREO_HTML
 
-        elif cuenta.cliente_final:
-            if not pin_input or pin_input != cuenta.pin_final:
-                return Response("<div class='alert alert-danger'>❌ PIN inválido o sin permiso.</div>", content_type='text/html; charset=utf-8')
+    except Limitado as e:
+        return respuesta_limitada(e, Response(f"<div class='alert alert-warning'>{e}</div>", content_type='text/html; charset=utf-8'))
+    except ConsultaEnCurso as e:
+        return respuesta_limitada(e, Response(f"<div class='alert alert-warning'>{e}</div>", content_type='text/html; charset=utf-8'), 503)
+    except Exception as e:
+        mensaje = f"<div class='alert alert-danger'>❌ Error IMAP: {str(e)}</div>"
 
-            if cuenta.filtro_actualizar_hogar:
-                filtros.append("Importante: Cómo actualizar tu Hogar con Netflix")
-            if cuenta.filtro_codigo_temporal:
-                filtros.append("Tu código de acceso temporal de Netflix")
+    return Response(mensaje, content_type='text/html; charset=utf-8')
 
-            # ❌ Comentados como pediste
-            # if cuenta.filtro_netflix:
-            #     filtros.append("Netflix: Tu código de inicio de sesión")
-            # if cuenta.filtro_dispositivo:
-            #     filtros.append("Un nuevo dispositivo está usando tu cuenta")
+# --------------------------
+# 📡 /buscar/stream: la misma búsqueda en Server-Sent Events
+# --------------------------
+# Eventos: "progreso" (cuenta validada, buzón revisado con N candidatos,
+# esperando), "resultado" con el HTML del correo y el código/enlace extraído,
+# o "error". Si el correo aún no llegó, se sigue mirando BUSCAR_VIGILAR
+# segundos: cada vuelta es solo un UID SEARCH gracias al cursor de cache_consultas.
+# Cada vuelta comparte la clave de consultas_en_vuelo con /buscar: si otra
+# pestaña del hogar ya está mirando, esta espera su resultado sin abrir sesión.
+def evento_sse(evento, datos):
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+def buscar_con_avisos(correo_input, clave_cache, filtros, opciones):
+    # Como consulta_imap_html pero va cediendo avisos; siempre por el pool de hilos
+    with admision.cupo_imap.reservar(), imap_pool.conexion() as mail:
+        raw_email, resultado, pendiente = yield from ejecutar_con_avisos(
+            cache_consultas.pasos_consultar(
+                mail.uidvalidity, correo_input, clave_cache, filtros, IMAP_ESCANEO, ventana_para(opciones)
+            ),
+            mail,
+        )
+    if pendiente is not None:
+        resultado = cuerpo_html(raw_email) if raw_email is not None else None
+        cache_consultas.registrar(pendiente, resultado)
+    return resultado
 
 
+def buscar_liderando(clave, futuro, correo_input, clave_cache, filtros, opciones):
+    # El líder cede sus avisos como eventos y publica el HTML a los que esperan
+    avisos = buscar_con_avisos(correo_input, clave_cache, filtros, opciones)
+    try:
+        while True:
+            _, candidatos = next(avisos)
+            yield evento_sse("progreso", {
+                "etapa": "buzon", "candidatos": candidatos,
+                "mensaje": f"📬 Buzón revisado: {candidatos} correo(s) candidato(s).",
+            })
+    except StopIteration as fin:
+        consultas_en_vuelo.terminar(clave, futuro, fin.value)
+        return fin.value
+    except GeneratorExit:
+        # Se cerró la pestaña a mitad de la búsqueda: los que esperaban reintentan
+        avisos.close()
+        consultas_en_vuelo.terminar(clave, futuro, error=ConsultaEnCurso())
+        raise
+    except BaseException as e:
+        consultas_en_vuelo.terminar(clave, futuro, error=e)
+        raise
+
+
+def esperar_lider(futuro):
+    # Seguidor: sin avisos propios, solo mantiene viva la conexión hasta el resultado
+    limite = time.monotonic() + CONSULTA_ESPERA_MAX
+    while not futuro.done():
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        wait([futuro], min(BUSCAR_VIGILAR_INTERVALO, restante))
+        if not futuro.done():
+            yield ": sigue\n\n"
+    return consultas_en_vuelo.esperar(futuro, 0)
+
+
+def eventos_busqueda(correo_input, filtros, opciones):
+    yield evento_sse("progreso", {"etapa": "cuenta", "mensaje": "✅ Cuenta validada, buscando tu correo..."})
+
+    usar_indice = INDICE_ACTIVO and indice_activo(INDICE_FRESCURA)
+    clave_cache = "html:" + "+".join(opciones)
+    limite = time.monotonic() + BUSCAR_VIGILAR
+    vuelta = 0
+    while True:
+        if usar_indice:
+            fila = buscar_en_indice(correo_input, opciones, ventana_para(opciones))
+            html_body = fila.html if fila else None
+            if vuelta == 0:
+                yield evento_sse("progreso", {"etapa": "buzon", "mensaje": "📬 Buzón revisado."})
         else:
-            # Cuenta sin cliente asociado
-            return Response("<div class='alert alert-danger'>❌ Esta cuenta no tiene cliente asociado.</div>", content_type='text/html; charset=utf-8')
-
-    else:
-        return Response("<div class='alert alert-danger'>❌ Esta cuenta no existe.</div>", content_type='text/html; charset=utf-8')
-
-    if not filtros:
-        return Response(
-            "<div class='alert alert-warning'>❌ Consultas Desactivadas :( </div>",
-            content_type='text/html; charset=utf-8'
-        )
+            clave = (correo_input, clave_cache)
+            futuro, lider = consultas_en_vuelo.unirse(clave)
+            if lider:
+                html_body = yield from buscar_liderando(clave, futuro, correo_input, clave_cache, filtros, opciones)
+            else:
+                html_body = yield from esperar_lider(futuro)
+
+        if html_body:
+            yield evento_sse("resultado", {"html": html_body, "codigo": extraer_primero(opciones, html_body)})
+            return
+
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            yield evento_sse("resultado", {"html": SIN_CORREO_HTML, "codigo": None})
+            return
+        if vuelta == 0:
+            yield evento_sse("progreso", {
+                "etapa": "esperando",
+                "mensaje": f"⏳ Aún no llega el correo, seguimos atentos {int(restante)} s...",
+            })
+        else:
+            yield ": sigue\n\n"  # comentario SSE: mantiene viva la conexión en proxies
+        time.sleep(min(BUSCAR_VIGILAR_INTERVALO, restante))
+        vuelta += 1
 
-    try:
-        mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        mail.login(IMAP_USER, IMAP_PASS)
-        mail.select("inbox")
-
-        status, data = mail.search(None, f'(TO "{correo_input}")')
-        ids = data[0].split()
-
-        html_body = None
-
-        for num in ids[::-1]:
-            typ, msg_data = mail.fetch(num, '(RFC822)')
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-
-            asunto = email.header.decode_header(msg["Subject"])[0][0]
-            if isinstance(asunto, bytes):
-                asunto = asunto.decode(errors="replace")
-            asunto = asunto.lower().strip()
-
-            if any(f.lower() in asunto for f in filtros):
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        ctype = part.get_content_type()
-                        charset = part.get_content_charset() or "utf-8"
-                        if ctype == "text/html":
-                            html_body = part.get_payload(decode=True).decode(charset, errors="replace")
-                            break
-                        elif ctype == "text/plain" and not html_body:
-                            html_body = f"<pre>{part.get_payload(decode=True).decode(charset, errors='replace')}</pre>"
-                else:
-                    charset = msg.get_content_charset() or "utf-8"
-                    if msg.get_content_type() == "text/html":
-                        html_body = msg.get_payload(decode=True).decode(charset, errors="replace")
-                    else:
-                        html_body = f"<pre>{msg.get_payload(decode=True).decode(charset, errors='replace')}</pre>"
-                break
-
-        mail.logout()
-        mensaje = html_body or "<div class='alert alert-warning'>✅ No se encontró ningún correo filtrado para este correo.</div>"
 
-    except Exception as e:
-        mensaje = f"<div class='alert alert-danger'>❌ Error IMAP: {str(e)}</div>"
+@app.route('/buscar/stream', methods=['POST'])
+def buscar_stream():
+    correo_input = normalizar_correo(request.form.get('correo'))
+    pin_input = request.form.get('pin', '').strip()
 
-    return Response(mensaje, content_type='text/html; charset=utf-8')
+    if not correo_input:
+        error = "<div class='alert alert-danger'>❌ Debes enviar un correo válido.</div>"
+    else:
+        try:
+            admision.verificar(correo_input, request.remote_addr)
+        except Limitado as e:
+            return respuesta_limitada(e, Response(f"<div class='alert alert-warning'>{e}</div>", content_type='text/html; charset=utf-8'))
+        error, filtros, opciones = filtros_busqueda(correo_input, pin_input)
+
+    def eventos():
+        if error:
+            yield evento_sse("error", {"html": error})
+            return
+        try:
+            yield from eventos_busqueda(correo_input, filtros, opciones)
+        except (Limitado, ConsultaEnCurso) as e:
+            yield evento_sse("error", {"html": f"<div class='alert alert-warning'>{e}</div>"})
+        except Exception as e:
+            yield evento_sse("error", {"html": f"<div class='alert alert-danger'>❌ Error IMAP: {str(e)}</div>"})
+
+    return Response(
+        stream_with_context(eventos()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # --------------------------
 # 📌 Endpoint: /api/consulta_hogar
@@ -311,48 +436,31 @@ def buscar():
 @app.route('/api/consulta_hogar', methods=['POST'])
 def consulta_hogar():
     data = request.json
-    correo_input = data.get('correo', '').strip().lower()
+    correo_input = normalizar_correo(data.get('correo'))
     pin_input = data.get('pin', '').strip()
     opcion = data.get('opcion', '').strip()
 
     if not correo_input:
         return jsonify({"resultado": "❌ Debes enviar un correo válido."})
 
-    cuenta = Cuenta.query.filter(db.func.lower(Cuenta.correo) == correo_input).first()
+    try:
+        admision.verificar(correo_input, request.remote_addr)
+    except Limitado as e:
+        return respuesta_limitada(e, jsonify({"resultado": str(e)}))
+
+    permiso = cache_permisos.obtener(correo_input)
     filtros = []
 
-    if cuenta:
-        # PREMIUM
-        if cuenta.cliente:
-            pin_valido = str(cuenta.cliente.pin_restablecer)
-            if not pin_input or str(pin_input) != pin_valido:
-                return jsonify({"resultado": "❌ PIN inválido o sin permiso."})
-
-            if opcion == "netflix" and cuenta.filtro_netflix:
-                filtros.append("inicio de sesión")
-            elif opcion == "actualizar_hogar" and cuenta.filtro_actualizar_hogar:
-                filtros.append("Importante: Cómo actualizar tu Hogar con Netflix")
-            elif opcion == "codigo_temporal" and cuenta.filtro_codigo_temporal:
-                filtros.append("código de acceso temporal")
-            elif opcion == "dispositivo" and cuenta.filtro_dispositivo:
-                filtros.append("nuevo dispositivo está usando tu cuenta")
-
-        # CLIENTE FINAL
-        elif cuenta.cliente_final:
-            pin_valido = cuenta.pin_final
-            if not pin_input or pin_input != pin_valido:
-                return jsonify({"resultado": "❌ PIN inválido o sin permiso."})
-
-            if opcion == "netflix" and cuenta.filtro_netflix:
-                filtros.append("inicio de sesión")
-            elif opcion == "actualizar_hogar" and cuenta.filtro_actualizar_hogar:
-                filtros.append("Importante: Cómo actualizar tu Hogar con Netflix")
-            elif opcion == "codigo_temporal" and cuenta.filtro_codigo_temporal:
-                filtros.append("código de acceso temporal")
-            elif opcion == "dispositivo" and cuenta.filtro_dispositivo:
-                filtros.append("nuevo dispositivo está usando tu cuenta")
-        else:
+    if permiso:
+        if permiso.tipo is None:
             return jsonify({"resultado": "❌ Esta cuenta no tiene cliente asociado."})
+
+        # PREMIUM (PIN del mayorista) o CLIENTE FINAL (pin_final de la cuenta)
+        if not permiso.pin_valido(pin_input):
+            return jsonify({"resultado": "❌ PIN inválido o sin permiso."})
+
+        if permiso.permite(opcion) and opcion in CATEGORIAS:
+            filtros.append(CATEGORIAS[opcion])
     else:
         return jsonify({"resultado": "❌ Esta cuenta no existe."})
 
@@ -360,11 +468,47 @@ def consulta_hogar():
         return jsonify({"resultado": "❌ Consultas Desactivadas :( "})
 
 
-    resultado = {}
-    Thread(target=consulta_imap_api_thread, args=(correo_input, filtros, opcion, pin_input, resultado)).start()
-    import time; time.sleep(3)
+    if INDICE_ACTIVO and indice_activo(INDICE_FRESCURA):
+        fila = buscar_en_indice(correo_input, [opcion], ventana_para([opcion]))
+        return jsonify({"resultado": fila.resultado if fila else SIN_RESULTADO})
+
+    # Si ya hay una consulta igual en curso, este trabajo comparte su resultado
+    clave = (correo_input, opcion)
+    try:
+        if IMAP_MOTOR == "asyncio":
+            trabajo_id = trabajos.enviar_futuro(lambda: consultas_en_vuelo.futuro(
+                clave, lambda: con_cupo_imap(lambda: motor_imap.enviar(consulta_imap_api_async(correo_input, filtros, opcion)))
+            ))
+        else:
+            trabajo_id = trabajos.enviar_futuro(lambda: consultas_en_vuelo.futuro(
+                clave, lambda: con_cupo_imap(lambda: trabajos.lanzar(consulta_imap_api, correo_input, filtros, opcion))
+            ))
+    except Limitado as e:
+        return respuesta_limitada(e, jsonify({"resultado": str(e)}))
+    except Saturado as e:
+        return jsonify({"resultado": str(e)}), 503
+
+    # ⚡️ Responde apenas IMAP conteste; si tarda más, el cliente consulta el trabajo
+    return respuesta_trabajo(trabajo_id, CONSULTA_ESPERA)
+
+
+@app.route('/api/consulta_hogar/<trabajo_id>', methods=['GET'])
+def consulta_hogar_estado(trabajo_id):
+    espera = min(request.args.get('esperar', 0, type=float), CONSULTA_ESPERA_MAX)
+    return respuesta_trabajo(trabajo_id, max(espera, 0))
+
 
-    return jsonify({"resultado": resultado.get("msg", "✅ No se encontró correo válido para esta consulta.")})
+def respuesta_trabajo(trabajo_id, espera):
+    existe, listo, mensaje = trabajos.esperar(trabajo_id, espera)
+    if not existe:
+        return jsonify({"resultado": "❌ Consulta no encontrada o expirada."}), 404
+    if listo:
+        return jsonify({"resultado": mensaje, "estado": "listo", "trabajo_id": trabajo_id})
+    return jsonify({
+        "resultado": "⏳ Tu consulta sigue en proceso...",
+        "estado": "pendiente",
+        "trabajo_id": trabajo_id,
+    }), 202, {"Retry-After": "2"}
 
 
 # --------------------------
@@ -372,6 +516,6 @@ def consulta_hogar():
 # --------------------------
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all() 
+        db.create_all()
 
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,188 @@
+import random
+from datetime import date
+
+from sqlalchemy import bindparam, delete, func, select, update
+
+from models import db, Cliente, Cuenta
+from permisos import cache_permisos
+import estadisticas
+
+MAX_IDS = 10000
+CLAVES_FILTRO = {"cliente_id", "cliente_final_id", "tipo", "estado"}
+TIPOS = ("finales", "mayoristas")
+ESTADOS = ("vencidas", "vigentes")
+DIAS_RENOVACION = 30
+
+
+class SeleccionInvalida(ValueError):
+    pass
+
+
+# --------------------------
+# 🎯 Qué cuentas: lista de ids o filtro
+# --------------------------
+def lista_ids(ids):
+    # Solo una lista JSON de enteros (true/false no cuentan como 1/0)
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise SeleccionInvalida("❌ ids debe ser una lista de números enteros.")
+    if len(ids) > MAX_IDS:
+        raise SeleccionInvalida(f"❌ Máximo {MAX_IDS} ids por petición; usa un filtro.")
+    return ids
+
+
+def condicion_cuentas(data):
+    # {"ids": [1, 2, 3]} o {"filtro": {"cliente_id": 7, "estado": "vencidas"}}
+    # El cuerpo llega tal cual del JSON: se revisan los tipos antes de usarlo,
+    # un "ids": "12" no debe leerse como las cuentas 1 y 2. Nada se ignora en
+    # silencio: un filtro mal escrito ampliaría la selección de un borrado.
+    if not isinstance(data, dict):
+        raise SeleccionInvalida("❌ El cuerpo debe ser un objeto JSON.")
+
+    if data.get("ids") is not None:
+        ids = lista_ids(data["ids"])
+        if not ids:
+            raise SeleccionInvalida("❌ La lista de ids está vacía.")
+        return Cuenta.id.in_(ids)
+
+    filtro = data.get("filtro")
+    if filtro is None:
+        filtro = {}
+    elif not isinstance(filtro, dict):
+        raise SeleccionInvalida("❌ filtro debe ser un objeto JSON.")
+    desconocidas = set(filtro) - CLAVES_FILTRO
+    if desconocidas:
+        raise SeleccionInvalida(f"❌ Filtro desconocido: {', '.join(sorted(desconocidas))}.")
+    if filtro.get("tipo") is not None and filtro["tipo"] not in TIPOS:
+        raise SeleccionInvalida(f"❌ tipo debe ser {' o '.join(TIPOS)}.")
+    if filtro.get("estado") is not None and filtro["estado"] not in ESTADOS:
+        raise SeleccionInvalida(f"❌ estado debe ser {' o '.join(ESTADOS)}.")
+    condiciones = []
+    try:
+        if filtro.get("cliente_id") is not None:
+            condiciones.append(Cuenta.cliente_id == int(filtro["cliente_id"]))
+        if filtro.get("cliente_final_id") is not None:
+            condiciones.append(Cuenta.cliente_final_id == int(filtro["cliente_final_id"]))
+    except (TypeError, ValueError):
+        raise SeleccionInvalida("❌ Filtro inválido.")
+    if filtro.get("tipo") == "finales":
+        condiciones.append(Cuenta.cliente_final_id.isnot(None))
+    elif filtro.get("tipo") == "mayoristas":
+        condiciones.append(Cuenta.cliente_id.isnot(None))
+
+    hoy = date.today()
+    if filtro.get("estado") == "vencidas":
+        condiciones.append(Cuenta.fecha_expiracion < hoy)
+    elif filtro.get("estado") == "vigentes":
+        condiciones.append(Cuenta.fecha_expiracion >= hoy)
+
+    if not condiciones:
+        raise SeleccionInvalida("❌ Indica ids o un filtro (cliente_id, cliente_final_id, tipo o estado).")
+    return db.and_(*condiciones)
+
+
+def _sumar_dias(columna, dias):
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == "sqlite":
+        return func.date(columna, f"+{int(dias)} days")
+    if dialecto == "postgresql":
+        return columna + int(dias)  # date + integer -> date
+    return func.date_add(columna, db.text(f"INTERVAL {int(dias)} DAY"))
+
+
+def _ejecutar(sentencia, condicion, *columnas):
+    # Filas afectadas (para caché y contadores) en la misma sentencia si el
+    # dialecto soporta RETURNING; si no, se leen antes con el mismo WHERE.
+    dialecto = db.session.get_bind().dialect
+    soporta = dialecto.delete_returning if sentencia.is_delete else dialecto.update_returning
+    if soporta:
+        return db.session.execute(sentencia.returning(*columnas)).all()
+    filas = db.session.execute(select(*columnas).where(condicion)).all()
+    db.session.execute(sentencia)
+    return filas
+
+
+# --------------------------
+# 🔁 Renovar +30 días y reactivar filtros (como renovar_cuenta)
+# --------------------------
+def renovar(condicion, dias=DIAS_RENOVACION):
+    hoy = date.today()
+    nueva_fecha = _sumar_dias(Cuenta.fecha_expiracion, dias)
+    dejan_de_vencer = db.session.execute(
+        select(func.count(Cuenta.id)).where(condicion, Cuenta.fecha_expiracion < hoy, nueva_fecha >= hoy)
+    ).scalar()
+
+    filas = _ejecutar(
+        update(Cuenta).where(condicion).values(
+            fecha_expiracion=nueva_fecha,
+            filtro_netflix=True,
+            filtro_dispositivo=True,
+            filtro_actualizar_hogar=True,
+            filtro_codigo_temporal=True,
+        ).execution_options(synchronize_session=False),
+        condicion, Cuenta.correo_normalizado,
+    )
+    estadisticas.ajustar(cuentas_vencidas=-dejan_de_vencer)
+    db.session.commit()
+    cache_permisos.invalidar(*(correo for (correo,) in filas))
+    return len(filas)
+
+
+# --------------------------
+# 🔑 PINs nuevos: un UPDATE preparado, un PIN distinto por fila
+# --------------------------
+def _pines(ids):
+    return [{"b_id": i, "b_pin": str(random.randint(1000, 9999))} for i in ids]
+
+
+def regenerar_pines_finales(condicion):
+    filas = db.session.execute(
+        select(Cuenta.id, Cuenta.correo_normalizado).where(condicion, Cuenta.cliente_final_id.isnot(None))
+    ).all()
+    pines = _pines([cuenta_id for cuenta_id, _ in filas])
+    if pines:
+        db.session.execute(
+            update(Cuenta.__table__).where(Cuenta.__table__.c.id == bindparam("b_id")).values(pin_final=bindparam("b_pin")),
+            pines,
+        )
+    db.session.commit()
+    cache_permisos.invalidar(*(correo for _, correo in filas))
+    return {p["b_id"]: p["b_pin"] for p in pines}
+
+
+def regenerar_pines_clientes(cliente_ids):
+    cliente_ids = lista_ids(cliente_ids)
+    existentes = db.session.execute(select(Cliente.id).where(Cliente.id.in_(cliente_ids))).scalars().all()
+    pines = _pines(existentes)
+    if pines:
+        db.session.execute(
+            update(Cliente.__table__).where(Cliente.__table__.c.id == bindparam("b_id")).values(pin_restablecer=bindparam("b_pin")),
+            pines,
+        )
+    db.session.commit()
+    for cliente_id in existentes:
+        cache_permisos.invalidar_cliente(cliente_id)
+    return {p["b_id"]: p["b_pin"] for p in pines}
+
+
+# --------------------------
+# 🗑️ Eliminar
+# --------------------------
+def eliminar(condicion):
+    filas = _ejecutar(
+        delete(Cuenta).where(condicion).execution_options(synchronize_session=False),
+        condicion,
+        Cuenta.correo_normalizado, Cuenta.cliente_id, Cuenta.cliente_final_id, Cuenta.fecha_expiracion,
+    )
+
+    deltas = estadisticas.deltas_cuentas(filas, -1)
+    # Clientes finales que se quedaron sin ninguna cuenta
+    finales = {fila.cliente_final_id for fila in filas if fila.cliente_final_id is not None}
+    if finales:
+        con_cuentas = db.session.execute(
+            select(Cuenta.cliente_final_id).where(Cuenta.cliente_final_id.in_(finales)).distinct()
+        ).scalars().all()
+        deltas["total_clientes_finales"] = -len(finales - set(con_cuentas))
+    estadisticas.ajustar(**deltas)
+    db.session.commit()
+    cache_permisos.invalidar(*(fila.correo_normalizado for fila in filas))
+    return len(filas)
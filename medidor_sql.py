@@ -0,0 +1,114 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger("sql")
+
+ESPACIOS_RE = re.compile(r"\s+")
+LISTA_PARAMETROS_RE = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+def forma(sentencia):
+    # Misma consulta con distinto número de parámetros en un IN (...) = misma forma
+    return LISTA_PARAMETROS_RE.sub("(…)", ESPACIOS_RE.sub(" ", sentencia).strip())
+
+
+def presupuesto_sql(maximo):
+    # @presupuesto_sql(3) sobre una vista: su propio límite de consultas
+    def decorador(vista):
+        vista.presupuesto_sql = maximo
+        return vista
+    return decorador
+
+
+class _Medicion:
+    __slots__ = ("consultas", "tiempo", "formas")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.formas = Counter()
+
+    def repetidas(self, umbral):
+        return [(texto, n) for texto, n in self.formas.most_common() if n >= umbral]
+
+
+# --------------------------
+# 📏 Conteo de consultas por request (eventos del Engine)
+# --------------------------
+class MedidorSql:
+    # Cuenta consultas, tiempo en BD y formas repetidas (N+1) de cada request.
+    # Se publican en cabeceras X-SQL-* / Server-Timing y en el log "sql".
+    # Con estricto=True (tests) pasar el presupuesto lanza PresupuestoExcedido.
+    def __init__(self, app=None, presupuesto=0, estricto=False, umbral_repetidas=3):
+        self.presupuesto = presupuesto
+        self.estricto = estricto
+        self.umbral_repetidas = umbral_repetidas
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Se escucha en la clase Engine: Flask-SQLAlchemy crea el engine tarde
+        if not event.contains(Engine, "before_cursor_execute", _antes):
+            event.listen(Engine, "before_cursor_execute", _antes)
+            event.listen(Engine, "after_cursor_execute", _despues)
+        app.before_request(self._iniciar)
+        app.after_request(self._cerrar)
+
+    def _iniciar(self):
+        g.medicion_sql = _Medicion()
+
+    def _cerrar(self, respuesta):
+        medicion = g.pop("medicion_sql", None)
+        if medicion is None:
+            return respuesta
+
+        ms = medicion.tiempo * 1000
+        repetidas = medicion.repetidas(self.umbral_repetidas)
+        respuesta.headers["X-SQL-Consultas"] = str(medicion.consultas)
+        respuesta.headers["X-SQL-Tiempo-ms"] = f"{ms:.1f}"
+        respuesta.headers["X-SQL-Repetidas"] = str(len(repetidas))
+        respuesta.headers.add("Server-Timing", f"db;dur={ms:.1f}")
+
+        log.debug("%s %s: %d consultas, %.1f ms", request.method, request.path, medicion.consultas, ms)
+        for texto, n in repetidas:
+            log.debug("  %dx %s", n, texto[:300])
+
+        vista = current_app.view_functions.get(request.endpoint)
+        maximo = getattr(vista, "presupuesto_sql", None) or self.presupuesto
+        if maximo and medicion.consultas > maximo:
+            mensaje = (
+                f"{request.endpoint}: {medicion.consultas} consultas SQL (presupuesto {maximo}); "
+                f"repetidas: {[(n, texto[:120]) for texto, n in repetidas]}"
+            )
+            if self.estricto:
+                raise PresupuestoExcedido(mensaje)
+            log.warning(mensaje)
+        return respuesta
+
+
+def _antes(conn, cursor, sentencia, parametros, contexto, executemany):
+    if has_request_context() and "medicion_sql" in g:
+        conn.info.setdefault("medicion_sql_inicio", []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, sentencia, parametros, contexto, executemany):
+    inicios = conn.info.get("medicion_sql_inicio")
+    if not inicios or not has_request_context():
+        return
+    inicio = inicios.pop()
+    medicion = g.get("medicion_sql")
+    if medicion is None:
+        return
+    medicion.consultas += 1
+    medicion.tiempo += time.perf_counter() - inicio
+    medicion.formas[forma(sentencia)] += 1
@@ -1,5 +1,8 @@
 # migrate.py
-from app import db, app
+from app import create_app
+from models import db
+
+app = create_app()
 
 with app.app_context():
     print("🔄 Creando todas las tablas en la base de datos...")
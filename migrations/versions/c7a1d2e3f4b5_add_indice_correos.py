@@ -0,0 +1,50 @@
+"""Add indice de correos
+
+Revision ID: c7a1d2e3f4b5
+Revises: 44814530f8bb
+Create Date: 2026-10-18 10:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a1d2e3f4b5'
+down_revision = '44814530f8bb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('correo_indexado',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('uidvalidity', sa.BigInteger(), nullable=False),
+    sa.Column('uid', sa.BigInteger(), nullable=False),
+    sa.Column('destinatario', sa.String(length=255), nullable=False),
+    sa.Column('categoria', sa.String(length=30), nullable=False),
+    sa.Column('asunto', sa.String(length=500), nullable=True),
+    sa.Column('resultado', sa.Text(), nullable=True),
+    sa.Column('html', sa.Text(), nullable=True),
+    sa.Column('fecha_llegada', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('uidvalidity', 'uid', 'destinatario', name='uq_correo_indexado_uid')
+    )
+    with op.batch_alter_table('correo_indexado', schema=None) as batch_op:
+        batch_op.create_index('ix_correo_indexado_busqueda', ['destinatario', 'categoria', 'fecha_llegada'], unique=False)
+
+    op.create_table('estado_indexador',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('uidvalidity', sa.BigInteger(), nullable=True),
+    sa.Column('ultimo_uid', sa.BigInteger(), nullable=True),
+    sa.Column('latido', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('estado_indexador')
+    with op.batch_alter_table('correo_indexado', schema=None) as batch_op:
+        batch_op.drop_index('ix_correo_indexado_busqueda')
+
+    op.drop_table('correo_indexado')
@@ -0,0 +1,42 @@
+"""Add correo_normalizado a cuenta
+
+Revision ID: d4e8f1a2b3c6
+Revises: c7a1d2e3f4b5
+Create Date: 2026-10-18 16:40:12.882417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e8f1a2b3c6'
+down_revision = 'c7a1d2e3f4b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cuenta', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('correo_normalizado', sa.String(length=255), nullable=True))
+
+    # Backfill con la misma normalización que models.normalizar_correo
+    op.execute("UPDATE cuenta SET correo_normalizado = lower(trim(correo))")
+
+    duplicados = op.get_bind().execute(sa.text(
+        "SELECT correo_normalizado, count(*) FROM cuenta "
+        "GROUP BY correo_normalizado HAVING count(*) > 1 LIMIT 20"
+    )).fetchall()
+    if duplicados:
+        lista = ", ".join(f"{correo} ({n})" for correo, n in duplicados)
+        raise RuntimeError(f"Hay correos repetidos en cuenta, corrígelos antes de migrar: {lista}")
+
+    with op.batch_alter_table('cuenta', schema=None) as batch_op:
+        batch_op.alter_column('correo_normalizado', existing_type=sa.String(length=255), nullable=False)
+        batch_op.create_index(batch_op.f('ix_cuenta_correo_normalizado'), ['correo_normalizado'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('cuenta', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cuenta_correo_normalizado'))
+        batch_op.drop_column('correo_normalizado')
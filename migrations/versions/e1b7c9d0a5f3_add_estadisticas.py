@@ -0,0 +1,36 @@
+"""Add estadisticas del dashboard
+
+Revision ID: e1b7c9d0a5f3
+Revises: d4e8f1a2b3c6
+Create Date: 2026-10-18 18:05:47.130926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7c9d0a5f3'
+down_revision = 'd4e8f1a2b3c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('estadisticas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total_clientes', sa.Integer(), nullable=False),
+    sa.Column('total_clientes_finales', sa.Integer(), nullable=False),
+    sa.Column('total_cuentas', sa.Integer(), nullable=False),
+    sa.Column('total_mayoristas', sa.Integer(), nullable=False),
+    sa.Column('total_finales', sa.Integer(), nullable=False),
+    sa.Column('cuentas_vencidas', sa.Integer(), nullable=False),
+    sa.Column('fecha_vencidas', sa.Date(), nullable=True),
+    sa.Column('recalculado', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # La fila se llena sola en la primera visita al dashboard (estadisticas.leer)
+
+
+def downgrade():
+    op.drop_table('estadisticas')
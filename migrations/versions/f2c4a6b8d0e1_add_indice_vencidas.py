@@ -0,0 +1,26 @@
+"""Add indice (fecha_expiracion, cliente_id) a cuenta
+
+Revision ID: f2c4a6b8d0e1
+Revises: e1b7c9d0a5f3
+Create Date: 2026-10-18 19:22:03.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c4a6b8d0e1'
+down_revision = 'e1b7c9d0a5f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cuenta', schema=None) as batch_op:
+        batch_op.create_index('ix_cuenta_expiracion_cliente', ['fecha_expiracion', 'cliente_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cuenta', schema=None) as batch_op:
+        batch_op.drop_index('ix_cuenta_expiracion_cliente')
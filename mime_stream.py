@@ -0,0 +1,213 @@
+import base64
+import binascii
+import itertools
+import re
+from email.parser import BytesHeaderParser
+
+# --------------------------
+# 📌 Lectura MIME perezosa: solo se decodifica la parte de texto elegida
+# --------------------------
+# email.message_from_bytes arma el árbol completo (logos, adjuntos en base64...).
+# Aquí se recorren los límites del multipart sobre los bytes crudos, se leen
+# solo las cabeceras de cada parte y se decodifica únicamente la parte ganadora.
+
+FIN_CABECERAS_RE = re.compile(rb"\r?\n\r?\n")
+
+_parser = BytesHeaderParser()
+
+
+def separar(raw, inicio=0, fin=None):
+    # Devuelve (cabeceras, inicio_del_cuerpo) de la entidad raw[inicio:fin].
+    fin = len(raw) if fin is None else fin
+    for vacia in (b"\r\n", b"\n"):
+        # Parte sin cabeceras: el cuerpo empieza tras la línea en blanco
+        if raw.startswith(vacia, inicio, fin):
+            return _parser.parsebytes(b""), inicio + len(vacia)
+    corte = FIN_CABECERAS_RE.search(raw, inicio, fin)
+    if corte is None:
+        return _parser.parsebytes(raw[inicio:fin]), fin
+    return _parser.parsebytes(raw[inicio:corte.start()] + b"\r\n"), corte.end()
+
+
+def cabeceras(raw):
+    return separar(raw)[0]
+
+
+def _limites(raw, inicio, fin, boundary):
+    # Genera (inicio, fin) de cada parte entre los delimitadores --boundary.
+    marca = b"--" + boundary
+    pos = raw.find(marca, inicio, fin)
+    while pos != -1:
+        despues = pos + len(marca)
+        if raw[despues:despues + 2] == b"--":
+            return
+        inicio_parte = raw.find(b"\n", despues, fin)
+        if inicio_parte == -1:
+            return
+        inicio_parte += 1
+        siguiente = raw.find(b"\n" + marca, inicio_parte, fin)
+        if siguiente == -1:
+            yield inicio_parte, fin
+            return
+        fin_parte = siguiente - 1 if raw[siguiente - 1:siguiente] == b"\r" else siguiente
+        yield inicio_parte, fin_parte
+        pos = siguiente + 1
+
+
+def _buscar_parte(raw, inicio, fin, cabecera, preferido, alterno):
+    # Recorre el árbol sin decodificar nada; devuelve la primera parte `preferido`
+    # o, si no hay, la primera `alterno`, como (cabecera, inicio, fin).
+    ctype = cabecera.get_content_type()
+    if ctype == preferido:
+        return (cabecera, inicio, fin), None
+    if ctype.startswith("multipart/"):
+        boundary = cabecera.get_param("boundary")
+        if not boundary:
+            return None, None
+        boundary = boundary.encode("latin-1", errors="replace")
+        reserva = None
+        for inicio_parte, fin_parte in _limites(raw, inicio, fin, boundary):
+            cab_parte, cuerpo = separar(raw, inicio_parte, fin_parte)
+            if cab_parte.get_content_disposition() == "attachment":
+                continue
+            encontrada, alterna = _buscar_parte(raw, cuerpo, fin_parte, cab_parte, preferido, alterno)
+            if encontrada:
+                return encontrada, None
+            reserva = reserva or alterna
+        return None, reserva
+    if ctype == alterno:
+        return None, (cabecera, inicio, fin)
+    return None, None
+
+
+def decodificar(raw, inicio, fin, cabecera):
+    cuerpo = raw[inicio:fin]
+    cte = (cabecera.get("Content-Transfer-Encoding") or "").strip().lower()
+    if cte == "base64":
+        try:
+            cuerpo = base64.b64decode(cuerpo)
+        except (binascii.Error, ValueError):
+            cuerpo = b""
+    elif cte == "quoted-printable":
+        cuerpo = binascii.a2b_qp(cuerpo)
+    charset = cabecera.get_content_charset() or "utf-8"
+    try:
+        return cuerpo.decode(charset, errors="replace")
+    except LookupError:
+        return cuerpo.decode("utf-8", errors="replace")
+
+
+def primera_parte(raw, preferido="text/html", alterno="text/plain"):
+    # Devuelve (content_type, texto) de la parte elegida, o (None, None).
+    cabecera, cuerpo = separar(raw)
+    encontrada, reserva = _buscar_parte(raw, cuerpo, len(raw), cabecera, preferido, alterno)
+    elegida = encontrada or reserva
+    if elegida is None:
+        # Igual que antes: un correo sin partes de texto se muestra tal cual.
+        if not cabecera.get_content_type().startswith("multipart/"):
+            return cabecera.get_content_type(), decodificar(raw, cuerpo, len(raw), cabecera)
+        return None, None
+    cab_parte, inicio, fin = elegida
+    return cab_parte.get_content_type(), decodificar(raw, inicio, fin, cab_parte)
+
+
+# --------------------------
+# 📌 BODYSTRUCTURE: elegir la sección sin descargar el correo
+# --------------------------
+TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+LITERAL_RE = re.compile(rb"\{(\d+)\}$")
+
+
+def aplanar_fetch(data):
+    # Une la respuesta de imaplib en una sola línea; si el servidor mandó
+    # literales dentro del BODYSTRUCTURE se convierten en cadenas entre comillas.
+    linea = b""
+    for item in data:
+        if isinstance(item, tuple):
+            prefijo, literal = item
+            prefijo = LITERAL_RE.sub(b"", prefijo)
+            linea += prefijo + b'"' + literal.replace(b"\\", b"\\\\").replace(b'"', b'\\"') + b'"'
+        elif item:
+            linea += item
+    return linea
+
+
+def _lista(texto, pos):
+    elementos = []
+    while True:
+        token = TOKEN_RE.match(texto, pos)
+        if token is None:
+            return elementos, len(texto)
+        pos = token.end()
+        abre, cierra, cadena, atomo = token.groups()
+        if abre:
+            sub, pos = _lista(texto, pos)
+            elementos.append(sub)
+        elif cierra:
+            return elementos, pos
+        elif cadena is not None:
+            elementos.append(re.sub(rb"\\(.)", rb"\1", cadena).decode("utf-8", errors="replace"))
+        elif atomo.upper() == b"NIL":
+            elementos.append(None)
+        else:
+            elementos.append(atomo.decode("utf-8", errors="replace"))
+
+
+def estructura(respuesta):
+    # b'4 (UID 4 BODYSTRUCTURE (...))' -> lista anidada del BODYSTRUCTURE
+    inicio = respuesta.upper().find(b"BODYSTRUCTURE")
+    if inicio == -1:
+        return None
+    valor, _ = _lista(respuesta, inicio + len(b"BODYSTRUCTURE"))
+    return valor[0] if valor and isinstance(valor[0], list) else None
+
+
+def _parametros(lista):
+    if not isinstance(lista, list):
+        return {}
+    return {str(k).lower(): v for k, v in zip(lista[::2], lista[1::2])}
+
+
+def _es_adjunto(parte, indice_disposicion):
+    disposicion = parte[indice_disposicion] if len(parte) > indice_disposicion else None
+    return isinstance(disposicion, list) and bool(disposicion) and str(disposicion[0]).lower() == "attachment"
+
+
+def _buscar_seccion(parte, seccion, preferido, alterno):
+    if parte and isinstance(parte[0], list):
+        reserva = None
+        # Las partes van primero; después vienen el subtipo y las extensiones
+        hijos = itertools.takewhile(lambda p: isinstance(p, list), parte)
+        for i, hijo in enumerate(hijos, 1):
+            encontrada, alterna = _buscar_seccion(hijo, f"{seccion}.{i}" if seccion else str(i), preferido, alterno)
+            if encontrada:
+                return encontrada, None
+            reserva = reserva or alterna
+        return None, reserva
+    if len(parte) < 7:
+        return None, None
+    ctype = f"{parte[0]}/{parte[1]}".lower()
+    # En text/* la disposición va después de líneas y md5
+    if _es_adjunto(parte, 9 if ctype.startswith("text/") else 8):
+        return None, None
+    datos = (seccion or "1", ctype, (parte[5] or "7bit").lower(), _parametros(parte[2]).get("charset"))
+    if ctype == preferido:
+        return datos, None
+    if ctype == alterno:
+        return None, datos
+    return None, None
+
+
+def seccion_texto(bodystructure, preferido="text/html", alterno="text/plain"):
+    # Devuelve (seccion, content_type, cte, charset) o None.
+    if not bodystructure:
+        return None
+    encontrada, reserva = _buscar_seccion(bodystructure, "", preferido, alterno)
+    return encontrada or reserva
+
+
+def envolver(cuerpo, ctype, cte, charset=None):
+    # Rearma la sección descargada como una entidad MIME mínima para que
+    # primera_parte la decodifique igual que un correo completo.
+    tipo = f"Content-Type: {ctype}" + (f'; charset="{charset}"' if charset else "")
+    return (tipo + f"\r\nContent-Transfer-Encoding: {cte}\r\n\r\n").encode("latin-1", errors="replace") + cuerpo
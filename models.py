@@ -2,6 +2,7 @@ from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from sqlalchemy import Date
+from sqlalchemy.orm import validates
 from extensions import db  # ✅ solo usa este db
 
 # ---------------------------
@@ -59,10 +60,16 @@ class ClienteFinal(db.Model):
 # ---------------------------
 # 📩 Cuenta (mayoristas y finales)
 # ---------------------------
+def normalizar_correo(correo):
+    return (correo or "").strip().lower()
+
+
 class Cuenta(db.Model):
     __tablename__ = 'cuenta'
     id = db.Column(db.Integer, primary_key=True)
     correo = db.Column(db.String(255), nullable=False)
+    # ✅ Las búsquedas van por aquí (índice único), nunca por lower(correo)
+    correo_normalizado = db.Column(db.String(255), nullable=False, unique=True, index=True)
     fecha_compra = db.Column(Date)
     fecha_expiracion = db.Column(Date)
     activo = db.Column(db.Boolean, default=True)
@@ -82,3 +89,59 @@ class Cuenta(db.Model):
     cliente_final_id = db.Column(db.Integer, db.ForeignKey('cliente_final.id'), nullable=True)
     cliente_final = db.relationship('ClienteFinal', back_populates='cuentas', lazy='joined')
 
+    __table_args__ = (
+        # Vencidas agrupadas por mayorista (panel cuentas_vencidas)
+        db.Index('ix_cuenta_expiracion_cliente', 'fecha_expiracion', 'cliente_id'),
+    )
+
+    @validates('correo')
+    def _sincronizar_normalizado(self, key, correo):
+        self.correo_normalizado = normalizar_correo(correo)
+        return correo
+
+
+
+# ---------------------------
+# 📬 Índice de correos (lo llena el indexador en segundo plano)
+# ---------------------------
+class CorreoIndexado(db.Model):
+    __tablename__ = 'correo_indexado'
+    id = db.Column(db.Integer, primary_key=True)
+    uidvalidity = db.Column(db.BigInteger, nullable=False)
+    uid = db.Column(db.BigInteger, nullable=False)
+    destinatario = db.Column(db.String(255), nullable=False)
+    categoria = db.Column(db.String(30), nullable=False)
+    asunto = db.Column(db.String(500))
+    resultado = db.Column(db.Text)
+    html = db.Column(db.Text)
+    fecha_llegada = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('uidvalidity', 'uid', 'destinatario', name='uq_correo_indexado_uid'),
+        db.Index('ix_correo_indexado_busqueda', 'destinatario', 'categoria', 'fecha_llegada'),
+    )
+
+
+class EstadoIndexador(db.Model):
+    __tablename__ = 'estado_indexador'
+    id = db.Column(db.Integer, primary_key=True)
+    uidvalidity = db.Column(db.BigInteger)
+    ultimo_uid = db.Column(db.BigInteger, default=0)
+    latido = db.Column(db.DateTime)
+
+
+# ---------------------------
+# 📊 Contadores del dashboard (una sola fila, id=1)
+# ---------------------------
+class Estadisticas(db.Model):
+    __tablename__ = 'estadisticas'
+    id = db.Column(db.Integer, primary_key=True)
+    total_clientes = db.Column(db.Integer, nullable=False, default=0)
+    total_clientes_finales = db.Column(db.Integer, nullable=False, default=0)
+    total_cuentas = db.Column(db.Integer, nullable=False, default=0)
+    total_mayoristas = db.Column(db.Integer, nullable=False, default=0)
+    total_finales = db.Column(db.Integer, nullable=False, default=0)
+    cuentas_vencidas = db.Column(db.Integer, nullable=False, default=0)
+    # Día para el que vale cuentas_vencidas (a medianoche vencen más)
+    fecha_vencidas = db.Column(Date)
+    recalculado = db.Column(db.DateTime)
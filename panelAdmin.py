@@ -1,14 +1,20 @@
 from datetime import datetime, timedelta, date
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required
-from models import db, Cliente, ClienteFinal, Cuenta, AdminUser
-import random, smtplib, os
-from email.mime.text import MIMEText
-from collections import defaultdict
+from models import db, Cliente, ClienteFinal, Cuenta, AdminUser, normalizar_correo
+import random, os
 from models import ClienteFinal
-from urllib.parse import quote
+from itertools import chain
 from sqlalchemy.orm import joinedload
 from sqlalchemy import func, case
+from permisos import cache_permisos
+from vuelo_unico import consultas_en_vuelo
+from limites import admision
+from importacion import importar_cuentas, correos_de_texto, correos_de_csv
+import estadisticas
+import masivo
+import reportes
+from medidor_sql import presupuesto_sql
 
 panel_bp = Blueprint('panel', __name__, url_prefix='/panel')
 
@@ -16,6 +22,10 @@ panel_bp = Blueprint('panel', __name__, url_prefix='/panel')
 # 💌 Enviar correo 2FA
 # ---------------------------
 def send_email_2fa(to_email, code):
+    # smtplib/email.mime solo se cargan al iniciar sesión, no al arrancar
+    import smtplib
+    from email.mime.text import MIMEText
+
     from_addr = os.getenv("SMTP_USER")
     password = os.getenv("SMTP_PASS")
     msg = MIMEText(f"Tu código de verificación 2FA es: {code}", "plain")
@@ -27,6 +37,18 @@ def send_email_2fa(to_email, code):
         server.login(from_addr, password)
         server.sendmail(from_addr, [to_email], msg.as_string())
 
+# ---------------------------
+# 📩 Correos únicos por cuenta
+# ---------------------------
+CORREO_REPETIDO = "❌ Ya existe una cuenta con ese correo."
+
+
+def correo_ocupado(correo, cuenta_id=None):
+    consulta = Cuenta.query.filter_by(correo_normalizado=normalizar_correo(correo))
+    if cuenta_id is not None:
+        consulta = consulta.filter(Cuenta.id != cuenta_id)
+    return db.session.query(consulta.exists()).scalar()
+
 # ---------------------------
 # 🔑 LOGIN & LOGOUT
 # ---------------------------
@@ -76,29 +98,11 @@ def verify_2fa():
 # ---------------------------
 # dashboard
 @panel_bp.route('/dashboard')
+@presupuesto_sql(6)
 @login_required
 def dashboard():
-    total_clientes = Cliente.query.count()
-    total_clientes_finales = (
-        db.session.query(ClienteFinal)
-        .join(Cuenta, Cuenta.cliente_final_id == ClienteFinal.id)
-        .distinct()
-        .count()
-    )
-
-    total_cuentas = Cuenta.query.count()
-    total_mayoristas = Cuenta.query.filter(Cuenta.cliente_id != None).count()
-    total_finales = Cuenta.query.filter(Cuenta.cliente_final_id != None).count()
-    cuentas_vencidas = Cuenta.query.filter(Cuenta.fecha_expiracion < datetime.now().date()).count()
-
-    return render_template('admin/dashboard.html',
-        total_clientes=total_clientes,
-        total_clientes_finales=total_clientes_finales,
-        total_mayoristas=total_mayoristas,
-        total_finales=total_finales,
-        total_cuentas=total_cuentas,
-        cuentas_vencidas=cuentas_vencidas
-    )
+    # Contadores mantenidos al crear/eliminar/renovar (ver estadisticas.py)
+    return render_template('admin/dashboard.html', **estadisticas.leer())
 
 
 # ---------------------------
@@ -149,6 +153,7 @@ def nuevo_cliente():
         pin_restablecer=nuevo_pin
     )
     db.session.add(nuevo_cliente)
+    estadisticas.ajustar(total_clientes=1)
     db.session.commit()
 
     flash(f'✅ Cliente creado correctamente. PIN: {nuevo_pin}')
@@ -171,11 +176,15 @@ def api_nuevo_cliente():
         telefono=telefono
     )
     db.session.add(nuevo_cliente)
+    estadisticas.ajustar(total_clientes=1)
     db.session.commit()
 
     hoy = datetime.now().date()
+    correo = f"{nombre.lower().replace(' ', '_')}@fakecorreo.com"
+    if correo_ocupado(correo):
+        correo = f"{nombre.lower().replace(' ', '_')}_{nuevo_cliente.id}@fakecorreo.com"
     nueva_cuenta = Cuenta(
-        correo=f"{nombre.lower().replace(' ', '_')}@fakecorreo.com",
+        correo=correo,
         fecha_compra=hoy,
         fecha_expiracion=hoy + timedelta(days=30),
         cliente_id=nuevo_cliente.id,
@@ -185,7 +194,10 @@ def api_nuevo_cliente():
         filtro_codigo_temporal=True
     )
     db.session.add(nueva_cuenta)
+    db.session.flush()
+    estadisticas.cuentas_agregadas([nueva_cuenta])
     db.session.commit()
+    cache_permisos.invalidar(nueva_cuenta.correo_normalizado)
 
     return jsonify(success=True)
 
@@ -200,6 +212,7 @@ def eliminar_cliente(cliente_id):
         return redirect(url_for('panel.clientes'))
 
     db.session.delete(cliente)
+    estadisticas.ajustar(total_clientes=-1)
     db.session.commit()
     flash("✅ Cliente eliminado.")
     return redirect(url_for('panel.clientes'))
@@ -210,8 +223,11 @@ def eliminar_cliente(cliente_id):
 @login_required
 def eliminar_cliente_final(cliente_id):
     cliente = ClienteFinal.query.get_or_404(cliente_id)
+    correos = [cuenta.correo_normalizado for cuenta in cliente.cuentas]
+    estadisticas.cuentas_eliminadas(list(cliente.cuentas))
     db.session.delete(cliente)
     db.session.commit()
+    cache_permisos.invalidar(*correos)
     flash("✅ Cliente Final eliminado.")
     return redirect(url_for('panel.clientes_finales'))
 
@@ -240,17 +256,90 @@ def api_update_cliente(cliente_id):
 # ---------------------------
 # 📋 CLIENTES FINALES
 # ---------------------------
+POR_PAGINA = 50
+POR_PAGINA_MAX = 200
+
+
+def filtros_clientes_finales():
+    return {
+        "correo": request.args.get('correo', '').strip(),
+        "telefono": request.args.get('telefono', '').strip(),
+        "estado": request.args.get('estado', ''),
+    }
+
+
+def pagina_clientes_finales(filtros, desde=0, limite=POR_PAGINA):
+    # Keyset sobre Cuenta.id: WHERE id > :desde ORDER BY id LIMIT n, sin OFFSET.
+    # Devuelve (cuentas, siguiente) donde siguiente es el id desde el que seguir.
+    hoy = datetime.now().date()
+    consulta = (
+        db.session.query(Cuenta)
+        .options(joinedload(Cuenta.cliente_final))
+        .filter(Cuenta.cliente_final_id.isnot(None), Cuenta.id > desde)
+    )
+    if filtros["correo"]:
+        consulta = consulta.filter(Cuenta.correo_normalizado.contains(normalizar_correo(filtros["correo"]), autoescape=True))
+    if filtros["telefono"]:
+        consulta = consulta.filter(
+            Cuenta.cliente_final.has(ClienteFinal.telefono.contains(filtros["telefono"], autoescape=True))
+        )
+    if filtros["estado"] == "vencidas":
+        consulta = consulta.filter(Cuenta.fecha_expiracion < hoy)
+    elif filtros["estado"] == "vigentes":
+        consulta = consulta.filter(db.or_(Cuenta.fecha_expiracion >= hoy, Cuenta.fecha_expiracion.is_(None)))
+
+    cuentas = consulta.order_by(Cuenta.id.asc()).limit(limite + 1).all()
+    if len(cuentas) > limite:
+        cuentas = cuentas[:limite]
+        return cuentas, cuentas[-1].id
+    return cuentas, None
+
+
+def _limite_pagina():
+    return max(1, min(request.args.get('limite', POR_PAGINA, type=int), POR_PAGINA_MAX))
+
+
 @panel_bp.route('/clientes_finales')
+@presupuesto_sql(3)
 @login_required
 def clientes_finales():
-    cuentas = (
-        db.session.query(Cuenta)
-        .options(joinedload(Cuenta.cliente_final))
-        .filter(Cuenta.cliente_final_id.isnot(None))
-        .all()
+    filtros = filtros_clientes_finales()
+    cuentas, siguiente = pagina_clientes_finales(filtros, 0, _limite_pagina())
+    today = datetime.now().date()
+    return render_template('admin/clientes_finales.html', cuentas=cuentas, today=today,
+                           filtros=filtros, siguiente=siguiente)
+
+
+# ⏬ Misma lista en JSON para ir cargando filas con fetch()
+@panel_bp.route('/api/clientes_finales')
+@presupuesto_sql(3)
+@login_required
+def api_clientes_finales():
+    filtros = filtros_clientes_finales()
+    cuentas, siguiente = pagina_clientes_finales(
+        filtros, request.args.get('desde', 0, type=int), _limite_pagina()
     )
     today = datetime.now().date()
-    return render_template('admin/clientes_finales.html', cuentas=cuentas, today=today)
+    filas = "".join(
+        render_template('admin/_fila_cliente_final.html', cuenta=cuenta, today=today)
+        for cuenta in cuentas
+    )
+    return jsonify({
+        "cuentas": [{
+            "id": cuenta.id,
+            "correo": cuenta.correo,
+            "telefono": cuenta.cliente_final.telefono if cuenta.cliente_final else None,
+            "pin_final": cuenta.pin_final,
+            "fecha_compra": cuenta.fecha_compra.isoformat() if cuenta.fecha_compra else None,
+            "fecha_expiracion": cuenta.fecha_expiracion.isoformat() if cuenta.fecha_expiracion else None,
+            "vencida": bool(cuenta.fecha_expiracion and cuenta.fecha_expiracion < today),
+            "filtros_activos": all((cuenta.filtro_netflix, cuenta.filtro_dispositivo,
+                                    cuenta.filtro_actualizar_hogar, cuenta.filtro_codigo_temporal)),
+            "cliente_final_id": cuenta.cliente_final_id,
+        } for cuenta in cuentas],
+        "filas": filas,
+        "siguiente": siguiente,
+    })
 
 
 @panel_bp.route('/cuenta_final/<int:cuenta_id>')
@@ -280,6 +369,7 @@ def api_generar_pin_final(cuenta_id):
     nuevo_pin = str(random.randint(1000, 9999))
     cuenta.pin_final = nuevo_pin
     db.session.commit()
+    cache_permisos.invalidar(cuenta.correo_normalizado)
     return {"success": True, "nuevo_pin": nuevo_pin}
 
 @panel_bp.route('/api/cuenta_final/<int:cuenta_id>', methods=['POST'])
@@ -288,9 +378,14 @@ def api_update_cuenta_final(cuenta_id):
     data = request.get_json()
     cuenta = Cuenta.query.get_or_404(cuenta_id)
 
+    if correo_ocupado(data.get('correo'), cuenta.id):
+        return {"success": False, "error": CORREO_REPETIDO}, 409
+
     if cuenta.cliente_final:
         cuenta.cliente_final.telefono = data.get('telefono')
 
+    correo_anterior = cuenta.correo_normalizado
+    expiracion_anterior = cuenta.fecha_expiracion
     cuenta.correo = data.get('correo')
 
     # ✅ AÑADE ESTO:
@@ -302,7 +397,9 @@ def api_update_cuenta_final(cuenta_id):
     if fecha_expiracion_str:
         cuenta.fecha_expiracion = datetime.strptime(fecha_expiracion_str, '%Y-%m-%d').date()
 
+    estadisticas.vencimiento_cambiado(expiracion_anterior, cuenta.fecha_expiracion)
     db.session.commit()
+    cache_permisos.invalidar(correo_anterior, cuenta.correo_normalizado)
     return {"success": True}
 
 # ---------------------------
@@ -336,43 +433,20 @@ def nueva_cuenta(cliente_id):
     cliente = Cliente.query.get_or_404(cliente_id)
 
     if request.method == 'POST':
-        hoy = datetime.now().date()
-        fecha_expiracion = hoy + timedelta(days=30)
-
-        filtros = {
-            'filtro_netflix': True,
-            'filtro_dispositivo': True,
-            'filtro_actualizar_hogar': True,
-            'filtro_codigo_temporal': True
-        }
-
-        if request.form.get('correo_uno'):
-            correo = request.form.get('correo_uno').strip()
-            db.session.add(
-                Cuenta(
-                    correo=correo,
-                    fecha_compra=hoy,
-                    fecha_expiracion=fecha_expiracion,
-                    cliente_id=cliente.id,
-                    **filtros
-                )
-            )
-
-        for line in request.form.get('correos_varios', '').split('\n'):
-            correo = line.strip()
-            if correo:
-                db.session.add(
-                    Cuenta(
-                        correo=correo,
-                        fecha_compra=hoy,
-                        fecha_expiracion=fecha_expiracion,
-                        cliente_id=cliente.id,
-                        **filtros
-                    )
-                )
-
-        db.session.commit()
-        flash('✅ Cuenta(s) nueva(s) creada(s) correctamente.')
+        correos = chain(
+            [request.form.get('correo_uno', '')],
+            correos_de_texto(request.form.get('correos_varios', '')),
+        )
+        archivo = request.files.get('archivo')
+        if archivo and archivo.filename:
+            correos = chain(correos, correos_de_csv(archivo.stream))
+
+        resumen = importar_cuentas(correos, cliente.id)
+        flash(f"✅ {resumen['insertadas']} cuenta(s) nueva(s) creada(s) correctamente.")
+        omitidos = resumen['existentes'] + resumen['repetidas'] + resumen['invalidas']
+        if omitidos:
+            flash(f"⚠️ {omitidos} correo(s) omitido(s): {resumen['existentes']} ya existían, "
+                  f"{resumen['repetidas']} repetidos, {resumen['invalidas']} inválidos.")
         return redirect(url_for('panel.cuentas_cliente', cliente_id=cliente.id))
 
     return render_template('admin/nueva_cuenta.html', cliente=cliente)
@@ -394,10 +468,16 @@ def api_get_cuenta(cuenta_id):
 def api_update_cuenta(cuenta_id):
     data = request.get_json()
     cuenta = Cuenta.query.get_or_404(cuenta_id)
+    if correo_ocupado(data['correo'], cuenta.id):
+        return {"success": False, "error": CORREO_REPETIDO}, 409
+    correo_anterior = cuenta.correo_normalizado
+    expiracion_anterior = cuenta.fecha_expiracion
     cuenta.correo = data['correo']
     cuenta.fecha_compra = datetime.strptime(data['fecha_compra'], '%Y-%m-%d').date()
     cuenta.fecha_expiracion = datetime.strptime(data['fecha_expiracion'], '%Y-%m-%d').date()
+    estadisticas.vencimiento_cambiado(expiracion_anterior, cuenta.fecha_expiracion)
     db.session.commit()
+    cache_permisos.invalidar(correo_anterior, cuenta.correo_normalizado)
     return {"success": True}
 
 
@@ -410,7 +490,9 @@ def renovar_cuenta(cuenta_id):
     cuenta = Cuenta.query.get_or_404(cuenta_id)
 
     # ✅ SIEMPRE suma +30 días desde la expiración guardada
+    expiracion_anterior = cuenta.fecha_expiracion
     cuenta.fecha_expiracion = cuenta.fecha_expiracion + timedelta(days=30)
+    estadisticas.vencimiento_cambiado(expiracion_anterior, cuenta.fecha_expiracion)
 
     # ⚡️ Reactiva filtros si aplica
     cuenta.filtro_netflix = True
@@ -419,6 +501,7 @@ def renovar_cuenta(cuenta_id):
     cuenta.filtro_codigo_temporal = True
 
     db.session.commit()
+    cache_permisos.invalidar(cuenta.correo_normalizado)
     flash('✅ Cuenta renovada +30 días desde fecha de expiración.')
     return redirect(url_for('panel.cuentas_cliente', cliente_id=cuenta.cliente_id))
 
@@ -428,21 +511,125 @@ def renovar_cuenta(cuenta_id):
 def eliminar_cuenta(cuenta_id):
     cuenta = Cuenta.query.get_or_404(cuenta_id)
     cliente_id = cuenta.cliente_id
+    correo = cuenta.correo_normalizado
+    estadisticas.cuentas_eliminadas([cuenta])
     db.session.delete(cuenta)
     db.session.commit()
+    cache_permisos.invalidar(correo)
     flash('✅ Cuenta eliminada.')
     return redirect(url_for('panel.cuentas_cliente', cliente_id=cliente_id))
 
+VENCIDAS_CLIENTES_POR_PAGINA = 20
+VENCIDAS_CUENTAS_POR_CLIENTE = 20
+
+
+# ---------------------------
+# 📦 Operaciones masivas: {"ids": [...]} o {"filtro": {...}} (ver masivo.py)
+# ---------------------------
+def _operacion_masiva(operacion):
+    try:
+        condicion = masivo.condicion_cuentas(request.get_json(silent=True) or {})
+    except masivo.SeleccionInvalida as e:
+        return {"success": False, "error": str(e)}, 400
+    return {"success": True, "afectadas": operacion(condicion)}
+
+
+@panel_bp.route('/api/cuentas/renovar', methods=['POST'])
+@login_required
+def api_renovar_cuentas():
+    return _operacion_masiva(masivo.renovar)
+
+
+@panel_bp.route('/api/cuentas/eliminar', methods=['POST'])
+@login_required
+def api_eliminar_cuentas():
+    return _operacion_masiva(masivo.eliminar)
+
+
+@panel_bp.route('/api/cuentas/generar_pin_final', methods=['POST'])
+@login_required
+def api_generar_pines_finales():
+    try:
+        condicion = masivo.condicion_cuentas(request.get_json(silent=True) or {})
+    except masivo.SeleccionInvalida as e:
+        return {"success": False, "error": str(e)}, 400
+    pines = masivo.regenerar_pines_finales(condicion)
+    return {"success": True, "afectadas": len(pines), "pines": pines}
+
+
+@panel_bp.route('/api/clientes/generar_pin', methods=['POST'])
+@login_required
+def api_generar_pines_clientes():
+    data = request.get_json(silent=True) or {}
+    try:
+        if not isinstance(data, dict):
+            raise masivo.SeleccionInvalida("❌ El cuerpo debe ser un objeto JSON.")
+        pines = masivo.regenerar_pines_clientes(data.get('ids') or [])
+    except masivo.SeleccionInvalida as e:
+        return {"success": False, "error": str(e)}, 400
+    return {"success": True, "afectadas": len(pines), "pines": pines}
+
+
 @panel_bp.route('/cuentas_vencidas')
+@presupuesto_sql(6)
 @login_required
 def cuentas_vencidas():
-    cuentas = Cuenta.query.filter(Cuenta.fecha_expiracion < datetime.now().date()).all()
-    cuentas_por_cliente = defaultdict(list)
+    hoy = datetime.now().date()
+    desde = request.args.get('desde', 0, type=int)
+    vencida = Cuenta.fecha_expiracion < hoy
+
+    # 1️⃣ Una página de mayoristas con su conteo, agrupado en SQL
+    #    (usa ix_cuenta_expiracion_cliente; keyset sobre cliente_id)
+    grupos = (
+        db.session.query(Cuenta.cliente_id, func.count(Cuenta.id))
+        .filter(vencida, Cuenta.cliente_id > desde)
+        .group_by(Cuenta.cliente_id)
+        .order_by(Cuenta.cliente_id)
+        .limit(VENCIDAS_CLIENTES_POR_PAGINA + 1)
+        .all()
+    )
+    siguiente = None
+    if len(grupos) > VENCIDAS_CLIENTES_POR_PAGINA:
+        grupos = grupos[:VENCIDAS_CLIENTES_POR_PAGINA]
+        siguiente = grupos[-1][0]
+    ids = [cliente_id for cliente_id, _ in grupos]
+
+    # 2️⃣ Las primeras cuentas de cada mayorista de la página, en una consulta
+    orden = func.row_number().over(
+        partition_by=Cuenta.cliente_id, order_by=(Cuenta.fecha_expiracion, Cuenta.id)
+    ).label('orden')
+    primeras = (
+        db.session.query(Cuenta.id, Cuenta.cliente_id, Cuenta.correo, Cuenta.fecha_expiracion, orden)
+        .filter(vencida, Cuenta.cliente_id.in_(ids))
+        .subquery()
+    )
+    cuentas = (
+        db.session.query(primeras.c.id, primeras.c.cliente_id, primeras.c.correo, primeras.c.fecha_expiracion)
+        .filter(primeras.c.orden <= VENCIDAS_CUENTAS_POR_CLIENTE)
+        .order_by(primeras.c.cliente_id, primeras.c.orden)
+        .all()
+    ) if ids else []
+
+    clientes = {c.id: c for c in Cliente.query.filter(Cliente.id.in_(ids))} if ids else {}
+    cuentas_por_cliente = {
+        cliente_id: {"cliente": clientes.get(cliente_id), "total": total, "cuentas": []}
+        for cliente_id, total in grupos
+    }
     for cuenta in cuentas:
-        cuentas_por_cliente[cuenta.cliente_id].append(cuenta)
+        cuentas_por_cliente[cuenta.cliente_id]["cuentas"].append(cuenta)
+
+    finales_vencidas = (
+        db.session.query(func.count(Cuenta.id))
+        .filter(vencida, Cuenta.cliente_id.is_(None), Cuenta.cliente_final_id.isnot(None))
+        .scalar()
+    ) if not desde else None
+
     return render_template('admin/cuentas_vencidas.html',
-        cuentas=cuentas,
-        cuentas_por_cliente=cuentas_por_cliente
+        cuentas_por_cliente=cuentas_por_cliente,
+        por_cliente=VENCIDAS_CUENTAS_POR_CLIENTE,
+        finales_vencidas=finales_vencidas,
+        desde=desde,
+        siguiente=siguiente
     )
 
 @panel_bp.route('/buscar_correo')
@@ -450,7 +637,7 @@ def cuentas_vencidas():
 def buscar_correo():
     correo = request.args.get('correo')
 
-    cuenta = Cuenta.query.filter_by(correo=correo).first()
+    cuenta = Cuenta.query.filter_by(correo_normalizado=normalizar_correo(correo)).first()
 
     if cuenta:
         if cuenta.cliente_id:
@@ -470,6 +657,7 @@ def api_generar_pin(cliente_id):
     nuevo_pin = str(random.randint(1000, 9999))
     cliente.pin_restablecer = nuevo_pin
     db.session.commit()
+    cache_permisos.invalidar_cliente(cliente.id)
     return {"success": True, "nuevo_pin": nuevo_pin}
 
 # ✅ API para crear nuevo Cliente Final + su cuenta SIEMPRE con filtros activos
@@ -488,6 +676,9 @@ def api_nuevo_cliente_final():
     filtro_actualizar_hogar = True
     filtro_codigo_temporal = True
 
+    if not correo or correo_ocupado(correo):
+        return {"success": False, "error": CORREO_REPETIDO if correo else "Falta el correo"}, 409
+
     # 1️⃣ Crear ClienteFinal
     nuevo_cliente = ClienteFinal(
         nombre=nombre,
@@ -510,7 +701,10 @@ def api_nuevo_cliente_final():
         pin_final=str(random.randint(1000, 9999))
     )
     db.session.add(nueva_cuenta)
+    db.session.flush()
+    estadisticas.cuentas_agregadas([nueva_cuenta])
     db.session.commit()
+    cache_permisos.invalidar(nueva_cuenta.correo_normalizado)
 
     return {"success": True}
 
@@ -522,6 +716,7 @@ def renovar_cuenta_final(cuenta_id):
 
     base = cuenta.fecha_expiracion
     cuenta.fecha_expiracion = base + timedelta(days=30)
+    estadisticas.vencimiento_cambiado(base, cuenta.fecha_expiracion)
 
     # ✅ NO toques fecha_compra
 
@@ -532,6 +727,7 @@ def renovar_cuenta_final(cuenta_id):
     cuenta.filtro_codigo_temporal = True
 
     db.session.commit()
+    cache_permisos.invalidar(cuenta.correo_normalizado)
     flash('✅ Cuenta Final renovada +30 días.')
     return redirect(url_for('panel.clientes_finales'))
 
@@ -539,36 +735,11 @@ def renovar_cuenta_final(cuenta_id):
 @login_required
 def reportar_cuentas(cliente_id):
     cliente = Cliente.query.get_or_404(cliente_id)
-
-    vencidas = []
-    for cuenta in cliente.cuentas:
-        if cuenta.fecha_expiracion:
-            fecha_exp = cuenta.fecha_expiracion
-            fecha_fmt = fecha_exp.strftime('%d/%m/%Y')
-            if fecha_exp < datetime.now().date():  #Si prefieres que venza después de la fecha:
-                vencidas.append(f"📌 *{cuenta.correo}* (Expiró: {fecha_fmt})")
-        else:
-            vencidas.append(f"📌 *{cuenta.correo}* (Sin fecha de expiración)")
-
-    if not vencidas:
-        mensaje = f" Hola {cliente.nombre}, por ahora no tienes cuentas vencidas. "
-    else:
-        mensaje = (
-            f" Hola *{cliente.nombre}*:\n"
-            f"Tienes estas cuentas vencidas:\n\n"
-            + "\n".join(vencidas) +
-            "\n\nPor favor, contáctame para renovarlas y evitar corte de su servicio."
-        )
-
-    mensaje_encoded = quote(mensaje)
-
-    telefono = cliente.telefono or ""
-    if telefono.startswith("0"):
-        telefono = telefono[1:]
-
-    whatsapp_link = f"https://wa.me/{telefono}?text={mensaje_encoded}"
-
-    return redirect(whatsapp_link)
+    cuentas = reportes.cuentas_a_reportar(
+        reportes.MAYORISTAS, db.and_(Cliente.id == cliente.id, reportes.condicion_reporte())
+    )
+    mensaje = reportes.mensaje(reportes.MAYORISTAS, cliente.nombre, cuentas)
+    return redirect(reportes.enlace_whatsapp(reportes.MAYORISTAS, cliente.telefono, mensaje))
 
 # -------------------------------
 # 📌 Ruta para CLIENTES FINALES
@@ -578,82 +749,72 @@ def reportar_cuentas(cliente_id):
 @login_required
 def reportar_cuenta_final(cliente_id):
     cliente = ClienteFinal.query.get_or_404(cliente_id)
+    cuentas = reportes.cuentas_a_reportar(
+        reportes.FINALES, db.and_(ClienteFinal.id == cliente.id, reportes.condicion_reporte())
+    )
+    mensaje = reportes.mensaje(reportes.FINALES, cliente.nombre, cuentas)
+    return redirect(reportes.enlace_whatsapp(reportes.FINALES, cliente.telefono, mensaje))
 
-    vencidas = []
-    for cuenta in cliente.cuentas:
-        if cuenta.fecha_expiracion and cuenta.fecha_expiracion < datetime.now().date():
-            fecha_fmt = cuenta.fecha_expiracion.strftime('%d/%m/%Y')
-            vencidas.append(f"📧 {cuenta.correo} (Expiró: {fecha_fmt})")
-        elif not cuenta.fecha_expiracion:
-            vencidas.append(f"📧 {cuenta.correo} (Sin fecha de expiración)")
-
-    nombre = cliente.nombre or "<3"
-
-    if not vencidas:
-        mensaje = f" Hola {nombre}, por ahora no tienes cuentas vencidas. "
-    else:
-        mensaje = (
-            f" Hola :) {nombre} :\n"
-            f"Tienes estas cuentas vencidas:\n\n"
-            + "\n".join(vencidas) +
-            "\n\nPor favor, contáctame para renovarlas y evitar corte de su servicio. 🙂"
-        )
-
-    mensaje_encoded = quote(mensaje)
-    telefono = cliente.telefono or ""
-    if telefono.startswith("0"):
-        telefono = telefono[1:]
-    if not telefono.startswith("51"):
-        telefono = "51" + telefono
-
-    whatsapp_link = f"https://wa.me/{telefono}?text={mensaje_encoded}"
-    return redirect(whatsapp_link)
-
-
+# -------------------------------
+# 📣 Reporte de todos los clientes (CSV/JSON en streaming)
+# -------------------------------
+# ?tipo=mayoristas|finales (por defecto ambos), ?dias=N para las que vencen
+# en los próximos N días en vez de las vencidas, ?formato=csv|json
+@panel_bp.route('/api/reportes/vencidas')
+@login_required
+def api_reporte_vencidas():
+    tipo = request.args.get('tipo')
+    if tipo not in (None, '', reportes.MAYORISTAS, reportes.FINALES):
+        return jsonify({"error": "❌ tipo debe ser mayoristas o finales."}), 400
+    tipos = (tipo,) if tipo else (reportes.MAYORISTAS, reportes.FINALES)
+    dias = request.args.get('dias', type=int)
+    if dias is not None and dias < 0:
+        return jsonify({"error": "❌ dias no puede ser negativo."}), 400
+
+    filas = reportes.reporte(tipos, dias)
+    if request.args.get('formato', 'csv') == 'json':
+        return Response(stream_with_context(reportes.como_json(filas)), mimetype='application/json')
+    nombre = f"por_vencer_{dias}d.csv" if dias is not None else "vencidas.csv"
+    return Response(
+        stream_with_context(reportes.como_csv(filas)),
+        mimetype='text/csv',
+        headers={"Content-Disposition": f"attachment; filename={nombre}"},
+    )
 
 
+# Antes no pedía sesión: cualquiera podía crear cuentas. Ahora, como el resto del panel, sí.
 @panel_bp.route('/api/nueva_cuenta_premium', methods=['POST'])
+@login_required
 def api_nueva_cuenta_premium():
-    from flask import request, jsonify
-    from models import db, Cuenta
-    from datetime import datetime, timedelta
-
     data = request.get_json()
 
-    cliente_id = data.get('cliente_id')
-    correo_uno = data.get('correo_uno', '').strip()
-    correos_varios = data.get('correos_varios', '').split('\n')
-    hoy = datetime.now().date()
-    fecha_expiracion = hoy + timedelta(days=30)
+    cliente = Cliente.query.get_or_404(data.get('cliente_id'))
+    correos = chain([data.get('correo_uno', '')], correos_de_texto(data.get('correos_varios', '')))
+    resumen = importar_cuentas(correos, cliente.id)
+    return jsonify({'success': True, 'creadas': resumen['insertadas'], **resumen})
 
-    filtros = {
-        'filtro_netflix': True,
-        'filtro_dispositivo': True,
-        'filtro_actualizar_hogar': True,
-        'filtro_codigo_temporal': True
-    }
 
-    if correo_uno:
-        nueva = Cuenta(
-            correo=correo_uno,
-            fecha_compra=hoy,
-            fecha_expiracion=fecha_expiracion,
-            cliente_id=cliente_id,
-            **filtros
-        )
-        db.session.add(nueva)
-
-    for line in correos_varios:
-        correo = line.strip()
-        if correo:
-            nueva = Cuenta(
-                correo=correo,
-                fecha_compra=hoy,
-                fecha_expiracion=fecha_expiracion,
-                cliente_id=cliente_id,
-                **filtros
-            )
-            db.session.add(nueva)
+# 📥 Importación masiva: CSV subido (campo "archivo") o el cuerpo text/csv tal cual
+@panel_bp.route('/api/cuentas/importar/<int:cliente_id>', methods=['POST'])
+@login_required
+def api_importar_cuentas(cliente_id):
+    cliente = Cliente.query.get_or_404(cliente_id)
+    archivo = request.files.get('archivo')
+    if archivo and archivo.filename:
+        correos = correos_de_csv(archivo.stream)
+    elif request.mimetype in ('text/csv', 'text/plain'):
+        # Se lee del socket a medida que se inserta, sin cargar el cuerpo entero
+        correos = correos_de_csv(request.stream)
+    else:
+        data = request.get_json(silent=True) or {}
+        correos = correos_de_texto(data.get('correos', ''))
 
-    db.session.commit()
-    return jsonify({'success': True})
+    resumen = importar_cuentas(correos, cliente.id)
+    return jsonify({'success': True, **resumen})
+
+
+# 📈 Métricas del proceso (cada worker de gunicorn tiene las suyas)
+@panel_bp.route('/api/metricas')
+@login_required
+def api_metricas():
+    return jsonify({'consultas_en_vuelo': consultas_en_vuelo.metricas(), 'admision': admision.metricas()})
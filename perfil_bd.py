@@ -0,0 +1,91 @@
+import logging
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+
+def _entero(nombre, defecto):
+    return int(os.getenv(nombre, defecto))
+
+
+# --------------------------
+# 🐘 Postgres: pool y timeouts
+# --------------------------
+def perfil_postgres():
+    return {
+        "pool_size": _entero("DB_POOL_TAM", 5),
+        "max_overflow": _entero("DB_POOL_EXTRA", 10),
+        "pool_timeout": _entero("DB_POOL_ESPERA", 10),
+        # Render/Heroku cortan conexiones ociosas: se reciclan antes y se
+        # comprueban al sacarlas del pool en vez de fallar en la consulta
+        "pool_recycle": _entero("DB_POOL_RECICLAR", 1800),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }, {
+        "statement_timeout": _entero("DB_STATEMENT_TIMEOUT_MS", 15000),
+    }
+
+
+# --------------------------
+# 🪶 SQLite: WAL para que los lectores no esperen al escritor
+# --------------------------
+def perfil_sqlite():
+    busy_timeout = _entero("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    return {
+        "connect_args": {"timeout": busy_timeout / 1000},
+    }, {
+        "journal_mode": "WAL" if os.getenv("SQLITE_WAL", "1") == "1" else "DELETE",
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": _entero("SQLITE_MMAP_MB", 64) * 1024 * 1024,
+        "busy_timeout": busy_timeout,
+    }
+
+
+def _al_conectar_postgres(ajustes):
+    def al_conectar(conexion, _registro):
+        cursor = conexion.cursor()
+        cursor.execute(f"SET statement_timeout = {int(ajustes['statement_timeout'])}")
+        cursor.close()
+        conexion.commit()
+    return al_conectar
+
+
+def _al_conectar_sqlite(ajustes):
+    def al_conectar(conexion, _registro):
+        cursor = conexion.cursor()
+        for pragma, valor in ajustes.items():
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
+        cursor.close()
+    return al_conectar
+
+
+def configurar_bd(app, db, url):
+    # Elige el perfil por el dialecto de la URL, lo aplica y deja una línea en
+    # el log con lo efectivo. Llamar en lugar de db.init_app(app).
+    backend = make_url(url).get_backend_name()
+    if backend == "postgresql":
+        opciones, ajustes = perfil_postgres()
+        al_conectar = _al_conectar_postgres(ajustes)
+    elif backend == "sqlite":
+        opciones, ajustes = perfil_sqlite()
+        al_conectar = _al_conectar_sqlite(ajustes)
+    else:
+        opciones, ajustes, al_conectar = {}, {}, None
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**opciones, **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+    db.init_app(app)
+
+    with app.app_context():
+        if al_conectar is not None:
+            event.listen(db.engine, "connect", al_conectar)
+        efectivos = {clave: valor for clave, valor in opciones.items() if clave != "connect_args"}
+        efectivos.update(ajustes)
+        logger.info(
+            "BD %s pool=%s %s",
+            db.engine.url.render_as_string(hide_password=True),
+            type(db.engine.pool).__name__,
+            " ".join(f"{clave}={valor}" for clave, valor in efectivos.items()),
+        )
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+
+from models import db, Cliente, ClienteFinal, Cuenta
+
+# Un bit por opción; el orden coincide con los filtro_* de Cuenta
+FILTROS = {
+    "netflix": 1,
+    "dispositivo": 2,
+    "actualizar_hogar": 4,
+    "codigo_temporal": 8,
+}
+
+MAYORISTA = "mayorista"
+FINAL = "final"
+
+
+class Permiso:
+    # Lo único que /buscar y /api/consulta_hogar necesitan saber de una cuenta.
+    __slots__ = ("pin", "filtros", "expira", "tipo", "cliente_id")
+
+    def __init__(self, pin, filtros, expira, tipo, cliente_id=None):
+        self.pin = pin
+        self.filtros = filtros
+        self.expira = expira
+        self.tipo = tipo
+        self.cliente_id = cliente_id
+
+    def pin_valido(self, pin_input):
+        if not pin_input:
+            return False
+        if self.tipo == MAYORISTA:
+            return str(pin_input) == str(self.pin)
+        return pin_input == self.pin
+
+    def permite(self, opcion):
+        return bool(self.filtros & FILTROS.get(opcion, 0))
+
+
+def cargar_permiso(correo_normalizado):
+    # Solo columnas: nada de cargar Cuenta con sus joins a cliente/cliente_final.
+    fila = (
+        db.session.query(
+            Cuenta.pin_final, Cuenta.fecha_expiracion,
+            Cuenta.filtro_netflix, Cuenta.filtro_dispositivo,
+            Cuenta.filtro_actualizar_hogar, Cuenta.filtro_codigo_temporal,
+            Cliente.id, Cliente.pin_restablecer, ClienteFinal.id,
+        )
+        .outerjoin(Cliente, Cliente.id == Cuenta.cliente_id)
+        .outerjoin(ClienteFinal, ClienteFinal.id == Cuenta.cliente_final_id)
+        .filter(Cuenta.correo_normalizado == correo_normalizado)
+        .first()
+    )
+    if fila is None:
+        return None
+    (pin_final, expira, netflix, dispositivo, actualizar_hogar, codigo_temporal,
+     cliente_id, pin_cliente, cliente_final_id) = fila
+
+    filtros = 0
+    for opcion, activo in zip(FILTROS, (netflix, dispositivo, actualizar_hogar, codigo_temporal)):
+        if activo:
+            filtros |= FILTROS[opcion]
+
+    if cliente_id is not None:
+        return Permiso(pin_cliente, filtros, expira, MAYORISTA, cliente_id)
+    if cliente_final_id is not None:
+        return Permiso(pin_final, filtros, expira, FINAL)
+    return Permiso(None, filtros, expira, None)
+
+
+# --------------------------
+# 📌 Caché LRU correo normalizado → Permiso
+# --------------------------
+# El panel invalida al guardar (ver panelAdmin). El ttl acota lo que puede
+# durar una entrada vieja en otros workers de gunicorn, que no se enteran.
+class CachePermisos:
+    def __init__(self, max_entradas=10000, ttl=60):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._por_cliente = {}
+        self._generacion = 0
+        self._lock = threading.Lock()
+
+    def configurar(self, max_entradas=None, ttl=None):
+        if max_entradas is not None:
+            self.max_entradas = max_entradas
+        if ttl is not None:
+            self.ttl = ttl
+
+    def obtener(self, correo_normalizado, cargar=cargar_permiso):
+        # Devuelve el Permiso o None si la cuenta no existe (también se cachea).
+        with self._lock:
+            entrada = self._datos.get(correo_normalizado)
+            if entrada is not None and time.monotonic() - entrada[1] <= self.ttl:
+                self._datos.move_to_end(correo_normalizado)
+                return entrada[0]
+            generacion = self._generacion
+
+        permiso = cargar(correo_normalizado)
+
+        with self._lock:
+            # Si hubo una invalidación mientras se leía la BD, no se guarda lo leído
+            if generacion == self._generacion and self.max_entradas > 0:
+                self._quitar(correo_normalizado)
+                self._datos[correo_normalizado] = (permiso, time.monotonic())
+                if permiso is not None and permiso.cliente_id is not None:
+                    self._por_cliente.setdefault(permiso.cliente_id, set()).add(correo_normalizado)
+                while len(self._datos) > self.max_entradas:
+                    self._quitar(next(iter(self._datos)))
+        return permiso
+
+    def invalidar(self, *correos_normalizados):
+        with self._lock:
+            self._generacion += 1
+            for correo in correos_normalizados:
+                self._quitar(correo)
+
+    def invalidar_cliente(self, cliente_id):
+        # Un PIN de mayorista cubre todas sus cuentas
+        with self._lock:
+            self._generacion += 1
+            for correo in list(self._por_cliente.get(cliente_id, ())):
+                self._quitar(correo)
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._datos.clear()
+            self._por_cliente.clear()
+
+    def _quitar(self, correo):
+        entrada = self._datos.pop(correo, None)
+        if entrada is None or entrada[0] is None or entrada[0].cliente_id is None:
+            return
+        correos = self._por_cliente.get(entrada[0].cliente_id)
+        if correos is not None:
+            correos.discard(correo)
+            if not correos:
+                del self._por_cliente[entrada[0].cliente_id]
+
+
+cache_permisos = CachePermisos()
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+from itertools import groupby
+from urllib.parse import quote
+
+from sqlalchemy import or_, select
+
+from models import db, Cliente, ClienteFinal, Cuenta
+
+MAYORISTAS = "mayoristas"
+FINALES = "finales"
+COLUMNAS_CSV = ("tipo", "cliente_id", "nombre", "telefono", "cuentas", "mensaje", "enlace")
+
+
+# --------------------------
+# 💬 Mensajes de WhatsApp (los mismos que /reportar de cada cliente)
+# --------------------------
+def _linea(tipo, correo, fecha_expiracion, por_vencer):
+    if fecha_expiracion is None:
+        estado = "Sin fecha de expiración"
+    else:
+        estado = f"{'Vence' if por_vencer else 'Expiró'}: {fecha_expiracion.strftime('%d/%m/%Y')}"
+    if tipo == MAYORISTAS:
+        return f"📌 *{correo}* ({estado})"
+    return f"📧 {correo} ({estado})"
+
+
+def mensaje(tipo, nombre, cuentas, por_vencer=False):
+    # cuentas: [(correo, fecha_expiracion), ...]
+    que = "por vencer" if por_vencer else "vencidas"
+    if tipo == FINALES:
+        nombre = nombre or "<3"
+    if not cuentas:
+        return f" Hola {nombre}, por ahora no tienes cuentas {que}. "
+
+    lineas = "\n".join(_linea(tipo, correo, fecha, por_vencer) for correo, fecha in cuentas)
+    if tipo == MAYORISTAS:
+        return (
+            f" Hola *{nombre}*:\n"
+            f"Tienes estas cuentas {que}:\n\n"
+            + lineas +
+            "\n\nPor favor, contáctame para renovarlas y evitar corte de su servicio."
+        )
+    return (
+        f" Hola :) {nombre} :\n"
+        f"Tienes estas cuentas {que}:\n\n"
+        + lineas +
+        "\n\nPor favor, contáctame para renovarlas y evitar corte de su servicio. 🙂"
+    )
+
+
+def telefono_whatsapp(tipo, telefono):
+    telefono = telefono or ""
+    if telefono.startswith("0"):
+        telefono = telefono[1:]
+    if tipo == FINALES and not telefono.startswith("51"):
+        telefono = "51" + telefono
+    return telefono
+
+
+def enlace_whatsapp(tipo, telefono, texto):
+    return f"https://wa.me/{telefono_whatsapp(tipo, telefono)}?text={quote(texto)}"
+
+
+# --------------------------
+# 🗂️ Cuentas a reportar: una consulta por tipo, agrupada por cliente
+# --------------------------
+def condicion_reporte(dias=None, hoy=None):
+    # dias=None: vencidas (o sin fecha); dias=N: vencen entre hoy y hoy+N
+    hoy = hoy or date.today()
+    if dias is None:
+        return or_(Cuenta.fecha_expiracion < hoy, Cuenta.fecha_expiracion.is_(None))
+    return Cuenta.fecha_expiracion.between(hoy, hoy + timedelta(days=dias))
+
+
+def _consulta(tipo, condicion):
+    modelo, columna = (Cliente, Cuenta.cliente_id) if tipo == MAYORISTAS else (ClienteFinal, Cuenta.cliente_final_id)
+    return (
+        select(modelo.id, modelo.nombre, modelo.telefono, Cuenta.correo, Cuenta.fecha_expiracion)
+        .join(Cuenta, columna == modelo.id)
+        .where(condicion)
+        .order_by(modelo.id, Cuenta.fecha_expiracion, Cuenta.id)
+    )
+
+
+def cuentas_a_reportar(tipo, condicion):
+    # [(correo, fecha_expiracion), ...] de un cliente; base de /reportar
+    return [(fila.correo, fila.fecha_expiracion) for fila in db.session.execute(_consulta(tipo, condicion))]
+
+
+def reporte(tipos=(MAYORISTAS, FINALES), dias=None, hoy=None):
+    # Un dict por cliente con algo que reportar. Las filas llegan ordenadas por
+    # cliente y se leen por tandas (yield_per): no se carga todo en memoria.
+    por_vencer = dias is not None
+    condicion = condicion_reporte(dias, hoy)
+    for tipo in tipos:
+        filas = db.session.execute(_consulta(tipo, condicion).execution_options(yield_per=500))
+        for (cliente_id, nombre, telefono), grupo in groupby(filas, key=lambda fila: fila[:3]):
+            cuentas = [(fila.correo, fila.fecha_expiracion) for fila in grupo]
+            texto = mensaje(tipo, nombre, cuentas, por_vencer)
+            yield {
+                "tipo": tipo,
+                "cliente_id": cliente_id,
+                "nombre": nombre,
+                "telefono": telefono_whatsapp(tipo, telefono),
+                "cuentas": len(cuentas),
+                "mensaje": texto,
+                "enlace": enlace_whatsapp(tipo, telefono, texto),
+            }
+
+
+# --------------------------
+# 📤 Salida en trozos: CSV o JSON
+# --------------------------
+def como_csv(filas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS_CSV)
+    for fila in filas:
+        escritor.writerow([fila[columna] for columna in COLUMNAS_CSV])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def como_json(filas):
+    yield "["
+    separador = ""
+    for fila in filas:
+        yield separador + json.dumps(fila, ensure_ascii=False)
+        separador = ",\n"
+    yield "]\n"
@@ -0,0 +1,25 @@
+import pytest
+
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "LOGIN_DISABLED": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        # Pasarse del @presupuesto_sql de una vista hace fallar el test
+        "SQL_MEDIR": True,
+        "SQL_PRESUPUESTO_ESTRICTO": True,
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
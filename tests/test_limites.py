@@ -0,0 +1,56 @@
+import pytest
+from flask import request
+
+from app import create_app
+from limites import Admision, Limitado
+
+
+def app_con_limite(tmp_path, proxies):
+    app = create_app({
+        "TESTING": True,
+        "PROXIES_CONFIABLES": proxies,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+    })
+    admision = Admision()
+    admision.configurar(correo_por_minuto=0, ip_por_minuto=1, ip_rafaga=2)
+
+    @app.route("/limitado")
+    def limitado():
+        try:
+            admision.verificar(request.args["correo"], request.remote_addr)
+        except Limitado:
+            return "", 429
+        return request.remote_addr
+
+    return app.test_client()
+
+
+def test_x_forwarded_for_falso_no_reinicia_el_limite_por_ip(tmp_path):
+    client = app_con_limite(tmp_path, proxies=0)
+    estados = [
+        client.get(f"/limitado?correo=c{i}@x.com", headers={"X-Forwarded-For": f"10.0.0.{i}"}).status_code
+        for i in range(3)
+    ]
+    assert estados == [200, 200, 429]
+
+
+def test_sin_proxies_se_ignora_x_forwarded_for(tmp_path):
+    client = app_con_limite(tmp_path, proxies=0)
+    respuesta = client.get("/limitado?correo=a@x.com", headers={"X-Forwarded-For": "10.0.0.9"})
+    assert respuesta.get_data(as_text=True) == "127.0.0.1"
+
+
+def test_detras_de_un_proxy_se_usa_x_forwarded_for(tmp_path):
+    client = app_con_limite(tmp_path, proxies=1)
+    respuesta = client.get("/limitado?correo=a@x.com", headers={"X-Forwarded-For": "10.0.0.9"})
+    assert respuesta.get_data(as_text=True) == "10.0.0.9"
+
+
+@pytest.mark.parametrize("valor", ["0", None])
+def test_por_defecto_no_se_confia_en_proxies(tmp_path, monkeypatch, valor):
+    if valor is None:
+        monkeypatch.delenv("PROXIES_CONFIABLES", raising=False)
+    else:
+        monkeypatch.setenv("PROXIES_CONFIABLES", valor)
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}"})
+    assert not hasattr(app.wsgi_app, "x_for")
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+
+import pytest
+
+import masivo
+from models import db, Cliente, Cuenta
+
+
+@pytest.fixture
+def cuentas(app):
+    cliente = Cliente(nombre="Mayorista", pin_restablecer="1111")
+    db.session.add(cliente)
+    vence = date.today() + timedelta(days=5)
+    for i in range(1, 4):
+        db.session.add(Cuenta(id=i, correo=f"c{i}@x.com", fecha_expiracion=vence, cliente=cliente))
+    db.session.commit()
+    return cliente
+
+
+@pytest.mark.parametrize("cuerpo", [
+    {"ids": "12"},
+    {"ids": 5},
+    {"ids": [1, "2"]},
+    {"ids": [True]},
+    [1, 2],
+    {"filtro": [1]},
+    {"filtro": "vencidas"},
+])
+def test_seleccion_invalida(cuerpo):
+    with pytest.raises(masivo.SeleccionInvalida):
+        masivo.condicion_cuentas(cuerpo)
+
+
+@pytest.mark.parametrize("cuerpo", [{"ids": "12"}, {"ids": 5}, [1, 2]])
+def test_eliminar_rechaza_cuerpo_mal_tipado(client, cuentas, cuerpo):
+    respuesta = client.post("/panel/api/cuentas/eliminar", json=cuerpo)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()["success"] is False
+    assert db.session.query(Cuenta).count() == 3
+
+
+def test_eliminar_por_ids(client, cuentas):
+    respuesta = client.post("/panel/api/cuentas/eliminar", json={"ids": [1, 2]})
+    assert respuesta.get_json() == {"success": True, "afectadas": 2}
+    assert [c.id for c in db.session.query(Cuenta)] == [3]
+
+
+def test_generar_pines_clientes_rechaza_cadena(client, cuentas):
+    respuesta = client.post("/panel/api/clientes/generar_pin", json={"ids": str(cuentas.id)})
+    assert respuesta.status_code == 400
+    assert db.session.get(Cliente, cuentas.id).pin_restablecer == "1111"
+
+
+@pytest.mark.parametrize("cuerpo", [
+    {"filtro": {"cliente_id": 1, "estado": "expired"}},
+    {"filtro": {"cliente_id": 1, "tipo": "premium"}},
+    {"filtro": {"cliente_id": 1, "estad": "vencidas"}},
+    {"ids": []},
+])
+def test_renovar_no_amplia_la_seleccion(client, cuentas, cuerpo):
+    antes = sorted(c.fecha_expiracion for c in db.session.query(Cuenta))
+    respuesta = client.post("/panel/api/cuentas/renovar", json=cuerpo)
+    assert respuesta.status_code == 400
+    db.session.expire_all()
+    assert sorted(c.fecha_expiracion for c in db.session.query(Cuenta)) == antes
+
+
+@pytest.mark.parametrize("cuerpo", [
+    {"filtro": {"cliente_id": 1, "estado": "expired"}},
+    {"filtro": {"cliente_id": 1, "tipo": "premium"}},
+    {"filtro": {"cliente_id": 1, "estad": "vencidas"}},
+    {"ids": []},
+])
+def test_eliminar_no_amplia_la_seleccion(client, cuentas, cuerpo):
+    respuesta = client.post("/panel/api/cuentas/eliminar", json=cuerpo)
+    assert respuesta.status_code == 400
+    assert db.session.query(Cuenta).count() == 3
+
+
+def test_filtro_estado_vencidas_solo_toca_las_vencidas(client, cuentas):
+    db.session.get(Cuenta, 1).fecha_expiracion = date.today() - timedelta(days=1)
+    db.session.commit()
+    respuesta = client.post("/panel/api/cuentas/eliminar", json={"filtro": {"cliente_id": cuentas.id, "estado": "vencidas"}})
+    assert respuesta.get_json() == {"success": True, "afectadas": 1}
+    assert sorted(c.id for c in db.session.query(Cuenta)) == [2, 3]
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+import pytest
+
+from medidor_sql import PresupuestoExcedido, presupuesto_sql
+from models import db, AdminUser, Cliente, ClienteFinal, Cuenta
+
+
+@pytest.fixture
+def datos(app):
+    admin = AdminUser(username="admin", email="admin@x.com")
+    admin.set_password("clave")
+    db.session.add(admin)
+    hoy = date.today()
+    for i in range(5):
+        cliente = Cliente(nombre=f"Mayorista {i}", telefono="999", pin_restablecer="1111")
+        final = ClienteFinal(nombre=f"Final {i}", telefono="999")
+        for j in range(4):
+            vence = hoy + timedelta(days=(-1 if j % 2 else 10))
+            db.session.add(Cuenta(correo=f"m{i}-{j}@x.com", fecha_expiracion=vence, cliente=cliente))
+            db.session.add(Cuenta(correo=f"f{i}-{j}@x.com", fecha_expiracion=vence, cliente_final=final, pin_final="2222"))
+    db.session.commit()
+    return admin
+
+
+@pytest.fixture
+def sesion(app, client, datos):
+    # Sesión real (con la consulta del user_loader), no LOGIN_DISABLED
+    app.config["LOGIN_DISABLED"] = False
+    with client.session_transaction() as s:
+        s["_user_id"] = str(datos.id)
+        s["_fresh"] = True
+    return client
+
+
+def test_pasarse_del_presupuesto_falla(app, client, datos):
+    @app.route("/n_mas_1")
+    @presupuesto_sql(2)
+    def n_mas_1():
+        return str([len(c.cuentas) for c in Cliente.query.all()])
+
+    with pytest.raises(PresupuestoExcedido, match="n_mas_1"):
+        client.get("/n_mas_1")
+
+
+@pytest.mark.parametrize("url", [
+    "/panel/dashboard",
+    "/panel/clientes_finales",
+    "/panel/clientes_finales?estado=vencidas",
+    "/panel/api/clientes_finales",
+    "/panel/cuentas_vencidas",
+])
+def test_vistas_del_panel_dentro_de_su_presupuesto(sesion, url):
+    respuesta = sesion.get(url)
+    assert respuesta.status_code == 200
+    assert int(respuesta.headers["X-SQL-Consultas"]) > 0
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from vuelo_unico import VueloUnico, ConsultaEnCurso
+
+
+def test_seguidor_agotado_no_es_error_imap():
+    vuelo = VueloUnico()
+    soltar = threading.Event()
+    lider = threading.Thread(target=vuelo.ejecutar, args=("clave", soltar.wait))
+    lider.start()
+    while not vuelo.metricas()["en_vuelo"]:
+        pass
+
+    with pytest.raises(ConsultaEnCurso) as error:
+        vuelo.ejecutar("clave", lambda: "nunca", timeout=0.05)
+    assert error.value.reintentar > 0
+    assert vuelo.metricas()["agotados"] == 1
+
+    soltar.set()
+    lider.join()
+
+
+def test_timeout_del_lider_llega_tal_cual_al_seguidor():
+    vuelo = VueloUnico()
+    soltar = threading.Event()
+
+    def falla():
+        soltar.wait()
+        raise TimeoutError("IMAP no respondió")
+
+    def lider():
+        with pytest.raises(TimeoutError):
+            vuelo.ejecutar("clave", falla)
+
+    hilo = threading.Thread(target=lider)
+    hilo.start()
+    while not vuelo.metricas()["en_vuelo"]:
+        pass
+    threading.Timer(0.05, soltar.set).start()
+
+    with pytest.raises(TimeoutError, match="IMAP no respondió"):
+        vuelo.ejecutar("clave", lambda: "nunca", timeout=5)
+    hilo.join()
+    assert vuelo.metricas()["agotados"] == 0
+
+
+class _TerminaAlVencer(Future):
+    # El líder publica su resultado justo cuando vence la espera del seguidor
+    def result(self, timeout=None):
+        if timeout is not None and not self.done():
+            self.set_result("<p>4821</p>")
+            raise TimeoutError()
+        return super().result(timeout)
+
+
+def test_lider_termina_justo_al_vencer_la_espera():
+    vuelo = VueloUnico()
+    assert vuelo.esperar(_TerminaAlVencer(), timeout=0.01) == "<p>4821</p>"
+    assert vuelo.metricas()["agotados"] == 0
+
+
+def test_lider_falla_justo_al_vencer_la_espera():
+    class _FallaAlVencer(Future):
+        def result(self, timeout=None):
+            if timeout is not None and not self.done():
+                self.set_exception(ConnectionError("IMAP caído"))
+                raise TimeoutError()
+            return super().result(timeout)
+
+    with pytest.raises(ConnectionError):
+        VueloUnico().esperar(_FallaAlVencer(), timeout=0.01)
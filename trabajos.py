@@ -0,0 +1,56 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class Saturado(Exception):
+    pass
+
+
+# --------------------------
+# 📌 Trabajos en segundo plano con id consultable
+# --------------------------
+class Trabajos:
+    def __init__(self, max_hilos=8, max_pendientes=100, retencion=300):
+        self.max_pendientes = max_pendientes
+        self.retencion = retencion
+        self._executor = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="consulta")
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def enviar(self, fn, *args):
+        return self.enviar_futuro(lambda: self.lanzar(fn, *args))
+
+    def lanzar(self, fn, *args):
+        # Solo el Future, sin registrar trabajo (lo registra enviar_futuro)
+        return self._executor.submit(fn, *args)
+
+    def enviar_futuro(self, crear_futuro):
+        # Para trabajos que ya corren en otro lado (p. ej. el motor asyncio).
+        with self._lock:
+            self._purgar()
+            # Varios trabajos pueden compartir un mismo Future (vuelo_unico): cuenta una vez
+            pendientes = len({id(futuro) for futuro, _ in self._trabajos.values() if not futuro.done()})
+            if pendientes >= self.max_pendientes:
+                raise Saturado("❌ Demasiadas consultas en curso, intenta en unos segundos.")
+            trabajo_id = uuid.uuid4().hex
+            self._trabajos[trabajo_id] = (crear_futuro(), time.monotonic())
+        return trabajo_id
+
+    def esperar(self, trabajo_id, timeout):
+        # Devuelve (existe, listo, resultado)
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+        if trabajo is None:
+            return False, False, None
+        futuro, _ = trabajo
+        try:
+            return True, True, futuro.result(timeout=timeout)
+        except TimeoutError:
+            return True, False, None
+
+    def _purgar(self):
+        limite = time.monotonic() - self.retencion
+        for trabajo_id in [t for t, (f, creado) in self._trabajos.items() if f.done() and creado < limite]:
+            del self._trabajos[trabajo_id]
@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import Future, TimeoutError
+
+
+class ConsultaEnCurso(Exception):
+    # El líder sigue con IMAP pero quien esperaba se cansó: no es un error
+    # de IMAP, basta con reintentar (reintentar: segundos para Retry-After).
+    def __init__(self, reintentar=3):
+        super().__init__("⏳ Tu consulta sigue en proceso, intenta de nuevo en unos segundos.")
+        self.reintentar = reintentar
+
+
+# --------------------------
+# ✈️ Una sola consulta en vuelo por clave
+# --------------------------
+# Si varias personas de un mismo hogar piden el mismo (correo, opcion) a la
+# vez, la primera (líder) hace el escaneo IMAP y las demás se unen a su
+# resultado en vez de abrir cada una su sesión. Al terminar, la clave se
+# suelta: la siguiente consulta ya va por la caché de consultas.
+class VueloUnico:
+    def __init__(self):
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self.lideres = 0
+        self.unidos = 0
+        self.agotados = 0
+
+    def futuro(self, clave, crear_futuro):
+        # Para trabajos que devuelven un Future (pool de hilos, motor asyncio):
+        # crear_futuro solo se llama si no hay ya uno en vuelo para la clave.
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            if futuro is not None:
+                self.unidos += 1
+                return futuro
+            futuro = crear_futuro()
+            self._en_vuelo[clave] = futuro
+            self.lideres += 1
+        futuro.add_done_callback(lambda _: self._soltar(clave, futuro))
+        return futuro
+
+    def ejecutar(self, clave, fn, *args, timeout=None):
+        # Versión bloqueante: el líder corre fn en el hilo que llama.
+        futuro, lider = self.unirse(clave)
+        if not lider:
+            return self.esperar(futuro, timeout)
+        try:
+            resultado = fn(*args)
+        except BaseException as e:
+            self.terminar(clave, futuro, error=e)
+            raise
+        self.terminar(clave, futuro, resultado)
+        return resultado
+
+    def unirse(self, clave):
+        # Devuelve (futuro, lider). El líder hace el trabajo a su manera (p. ej.
+        # cediendo avisos en /buscar/stream) y lo publica con terminar().
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            if futuro is not None:
+                self.unidos += 1
+                return futuro, False
+            futuro = Future()
+            self._en_vuelo[clave] = futuro
+            self.lideres += 1
+            return futuro, True
+
+    def terminar(self, clave, futuro, resultado=None, error=None):
+        if error is not None:
+            futuro.set_exception(error)
+        else:
+            futuro.set_result(resultado)
+        self._soltar(clave, futuro)
+
+    def esperar(self, futuro, timeout=None):
+        try:
+            return futuro.result(timeout)
+        except TimeoutError:
+            if futuro.done():
+                # Terminó justo al vencer la espera: su resultado, o su propio error
+                return futuro.result()
+            with self._lock:
+                self.agotados += 1
+            raise ConsultaEnCurso()
+
+    def _soltar(self, clave, futuro):
+        with self._lock:
+            if self._en_vuelo.get(clave) is futuro:
+                del self._en_vuelo[clave]
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "lideres": self.lideres,
+                "unidos": self.unidos,
+                "agotados": self.agotados,
+                "en_vuelo": len(self._en_vuelo),
+            }
+
+
+consultas_en_vuelo = VueloUnico()